@@ -1,7 +1,7 @@
-import pandas as pd
+from GVR_Store import load_gvr_table #reads CSV or the .npz/.parquet store
 import plotly.express as px
 
-df = pd.read_csv("split_fast_experiment_with_gamma.csv")  # replace with your actual filename
+df = load_gvr_table("split_fast_experiment_with_gamma.csv")  # replace with your actual filename
 
 subset = df[(df["Gamma"] == 1.0) & (df["[NPM1]_WT"] == 0.5)]
 
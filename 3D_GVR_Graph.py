@@ -1,9 +1,16 @@
-import pandas as pd
+from GVR_Store import load_gvr_table #reads CSV or the .npz/.parquet store
+from GVR_Cube import open_gvr_cube
 import plotly.express as px
 
-df = pd.read_csv("split_fast_gvr_with_gamma.csv")  # replace with your actual filename
+results_file = "split_fast_gvr_with_gamma.csv"  # replace with your actual filename (e.g. split_fast_gvr_adaptive.csv)
 
-subset = df[(df["Gamma"] == 1.0) & (df["[NPM1]_WT"] == 0.5)]
+if results_file.endswith(".npy"):
+    #dense cube: [WT] = 0.5 is one contiguous block of rows and Gamma = 1.0 one column
+    cube = open_gvr_cube(results_file)
+    subset = cube.frame(points=cube.point_range([0.5]), gammas=cube.gamma_range([1.0]))
+else:
+    df = load_gvr_table(results_file)
+    subset = df[(df["Gamma"] == 1.0) & (df["[NPM1]_WT"] == 0.5)]
 
 fig = px.scatter_3d(
     subset,
@@ -1,7 +1,7 @@
-import pandas as pd
+from GVR_Store import load_gvr_table #reads CSV or the .npz/.parquet store
 import plotly.express as px
 
-df = pd.read_csv("npm1_gvr_distance_output.csv")  # replace with your actual filename
+df = load_gvr_table("npm1_gvr_distance_output.csv")  # replace with your actual filename
 
 subset = df[(df["Gamma1"] == 1.0) & (df["Gamma2"] == 0.5)]
 
@@ -1,33 +1,39 @@
-import pandas as pd
+from Chunked_Groupby import gamma_tuple_summary #reads CSV or the .npz/.parquet store in blocks
+from GVR_Cube import open_gvr_cube
 import plotly.express as px
 import numpy as np
 from tqdm import tqdm
 
-# Load dataset
-df = pd.read_csv("papa_gvr_output.csv")
-
-# Remove rows with NaN GVR
-df = df[df['GVR'].notna()]
-
-# Round gamma values to avoid float mismatch
-df['Gamma1'] = df['Gamma1'].round(3)
-df['Gamma2'] = df['Gamma2'].round(3)
-df['Gamma3'] = df['Gamma3'].round(3)
-df['Gamma4'] = df['Gamma4'].round(3)
+results_file = "papa_gvr_output.csv"
+# None: exact medians; a number (e.g. 200) keeps a KLL sketch of that size per gamma combination instead
+sketch_k = None
+cube = None
 
 # Define Gamma1 values to iterate through
 gamma1_values = np.round(np.arange(0.4, 2.1, 0.1), 2)
 
-# Group once and compute median GVR for all combinations
-summary = (
-    df.groupby(['Gamma1', 'Gamma2', 'Gamma3', 'Gamma4'])['GVR']
-    .median()
-    .reset_index()
-)
+if results_file.endswith(".npy"):
+    # Dense cube: one column per gamma combination, rows are the concentrations
+    cube = open_gvr_cube(results_file)
+    summary = cube.gamma_summary().rename(columns={'GVR_median': 'GVR'})
+    # Only Gamma1 values the cube was swept with have a column range
+    gamma1_values = [g1 for g1 in gamma1_values if np.isclose(cube.metadata['gamma_values'], g1).any()]
+else:
+    # Median GVR for all combinations, reading the results in blocks
+    # (rows with NaN GVR are left out, gamma values rounded to 3 decimals to avoid float mismatch)
+    summary = gamma_tuple_summary(results_file, decimals=3, sketch_k=sketch_k).rename(columns={'GVR_median': 'GVR'})
 
 # Loop through Gamma1 values and plot
 for g1 in tqdm(gamma1_values, desc="Plotting 3D scatter plots"):
-    subset = summary[summary['Gamma1'] == g1]
+    if cube is not None:
+        # Gamma1 = g1 is a contiguous range of columns
+        start, stop = cube.gamma_range([g1])
+        subset = summary.iloc[start:stop].dropna(subset=['GVR'])
+    else:
+        subset = summary[summary['Gamma1'] == g1]
+    # Nothing to plot for a Gamma1 the sweep does not have
+    if subset.empty:
+        continue
 
     fig = px.scatter_3d(
         subset,
@@ -0,0 +1,17 @@
+from Adaptive_Grid import adaptive_gvr_frame
+from TriPAPA_GVR_Calculation import compute_split_fast_gvr_batch, SPLIT_FAST_COLUMNS
+from GVR_Store import save_gvr_table
+
+#Split-FAST GVR on an adaptive grid: coarse (1/4) where GVR is close to linear, down to 1/64 where it bends
+gamma_values = [0.25, 0.5, 1.0, 2.0, 4.0]
+tol = 0.4 #GVR units, checked on every gamma column (so effectively 0.1 at Gamma = 1.0)
+
+df = adaptive_gvr_frame(compute_split_fast_gvr_batch, SPLIT_FAST_COLUMNS, gamma_values,
+                        tol=tol, initial_step=1 / 4, min_step=1 / 64)
+#only GVR is rounded: 1/64 concentrations need more than 3 decimals to stay on the lattice
+df["GVR"] = df["GVR"].round(3)
+
+print(f"{len(df) // len(gamma_values)} adaptive points")
+print(df.head())
+#same columns as split_fast_gvr_with_gamma.csv, so the graph scripts can read it directly
+save_gvr_table(df, "split_fast_gvr_adaptive.csv", model='split_fast')
@@ -0,0 +1,107 @@
+import numpy as np
+from itertools import product
+from GVR_Store import long_format
+
+"""adaptive concentration grid: in cumulative coordinates
+x_i = c_0 + ... + c_(i-1) the concentration simplex is the region
+0 <= x_1 <= ... <= x_(K-1) <= 1 of the unit cube, so it can be refined
+like a 2^d-tree. cubes are split until they are at most initial_step
+wide, then only where GVR between two cube corners misses their
+linear interpolation by more than tol, down to min_step. flat regions stay coarse
+while steep ones ([HALO] -> 0, the NFAST/CFAST pairing optimum) get fine
+points. every corner is a point of the simplex lattice with divisions
+1 / min_step (a power of 2), so the result is exact and GVR_Store /
+GVR_Cube can index it like a uniform sweep"""
+
+#cumulative integer coordinates (N x d) -> concentrations (N x d+1)
+def _concentrations(x, divisions):
+    n = len(x)
+    full = np.column_stack([np.zeros(n, dtype=np.int64), x, np.full(n, divisions, dtype=np.int64)])
+    return np.diff(full, axis=1) / divisions
+
+#how far each cube is from linear: largest |f((a + b) / 2) - (f(a) + f(b)) / 2| over pairs of
+#corners a, b inside the simplex (edge midpoints, face centers and the cube center); where no
+#midpoint has a value ([HALO] = 0), half the spread of the corner values stands in.
+#corner_values: (cubes x corners x columns), mid_values: (cubes x pairs x columns)
+def _interpolation_error(corner_values, mid_values, pair_a, pair_b):
+    with np.errstate(invalid='ignore'):
+        second = np.abs(mid_values - (corner_values[:, pair_a] + corner_values[:, pair_b]) / 2)
+    second = np.where(np.isfinite(second), second, -np.inf).max(axis=1)
+    finite = np.isfinite(corner_values)
+    hi = np.where(finite, corner_values, -np.inf).max(axis=1)
+    lo = np.where(finite, corner_values, np.inf).min(axis=1)
+    spread = np.where(finite.sum(axis=1) > 1, (hi - lo) / 2, 0.0)
+    return np.where(np.isfinite(second), second, spread).max(axis=1)
+
+"""func takes an (N x species) array of concentrations and returns N
+values, or an (N x M) array (e.g. one column per gamma), in which case a
+cube is refined when any column misses linear interpolation between two
+of its corners by more than tol. every round evaluates all of its new
+points (corners and midpoints) in one batch. returns the points (in
+simplex_lattice order), their values and the lattice divisions"""
+
+def adaptive_simplex(func, n_species, tol=0.01, initial_step=0.25, min_step=1 / 64, max_points=200_000):
+    d = n_species - 1
+    divisions = int(round(1 / min_step))
+    if divisions & (divisions - 1) or int(round(1 / initial_step)) & (int(round(1 / initial_step)) - 1):
+        raise ValueError("initial_step and min_step must be 1 / a power of 2")
+    initial = divisions // int(round(1 / initial_step))
+    offsets = np.array(list(product((0, 1), repeat=d)), dtype=np.int64)
+    #every pair of corners, and their midpoints in half-cube units
+    pair_a, pair_b = np.triu_indices(len(offsets), k=1)
+    mid_offsets = offsets[pair_a] + offsets[pair_b]
+    #points are keyed by one integer code (base divisions + 1 digits of their cumulative coordinates)
+    radix = (divisions + 1) ** np.arange(d, dtype=np.int64)
+
+    known_codes = np.empty(0, dtype=np.int64)
+    known_values = None
+    cubes = np.zeros((1, d), dtype=np.int64)
+    size = divisions
+
+    while len(cubes):
+        corners = cubes[:, None, :] + size * offsets[None, :, :]
+        inside = np.all(np.diff(corners, axis=2) >= 0, axis=2) & (corners[:, :, -1] <= divisions)
+        #drop cubes that only touch the simplex on its boundary
+        keep = inside.sum(axis=1) > d
+        cubes, corners, inside = cubes[keep], corners[keep], inside[keep]
+        codes = corners @ radix
+        #the simplex is convex, so the midpoint of two inside corners is inside too
+        pair_inside = inside[:, pair_a] & inside[:, pair_b]
+        mid_codes = (cubes[:, None, :] + (size // 2) * mid_offsets[None, :, :]) @ radix
+        if size == 1:
+            pair_inside[:] = False
+
+        new_codes = np.setdiff1d(np.concatenate([codes[inside], mid_codes[pair_inside]]), known_codes)
+        if len(new_codes):
+            x = (new_codes[:, None] // radix) % (divisions + 1)
+            new_values = np.asarray(func(_concentrations(x, divisions)), dtype=float).reshape(len(new_codes), -1)
+            known_codes = np.concatenate([known_codes, new_codes])
+            known_values = new_values if known_values is None else np.concatenate([known_values, new_values])
+            order = np.argsort(known_codes)
+            known_codes, known_values = known_codes[order], known_values[order]
+
+        if size == 1 or len(known_codes) >= max_points:
+            break
+        pos = np.searchsorted(known_codes, np.where(inside, codes, known_codes[0]))
+        corner_values = np.where(inside[:, :, None], known_values[pos], np.nan)
+        pos = np.searchsorted(known_codes, np.where(pair_inside, mid_codes, known_codes[0]))
+        mid_values = np.where(pair_inside[:, :, None], known_values[pos], np.nan)
+        error = _interpolation_error(corner_values, mid_values, pair_a, pair_b)
+        refine = (size > initial) | (error > tol)
+        half = size // 2
+        cubes = (cubes[refine][:, None, :] + half * offsets[None, :, :]).reshape(-1, d)
+        size = half
+
+    x = (known_codes[:, None] // radix) % (divisions + 1)
+    points = _concentrations(x, divisions)
+    order = np.lexsort(points.T[::-1])
+    values = known_values[order]
+    return points[order], values[:, 0] if values.shape[1] == 1 else values, divisions
+
+#long-format frame like the uniform sweeps (point outer, gamma inner);
+#gvr_batch(concentrations, gamma_values) -> (N x gammas), e.g. compute_split_fast_gvr_batch
+def adaptive_gvr_frame(gvr_batch, conc_columns, gamma_values, tol=0.01, initial_step=0.25,
+                       min_step=1 / 64, max_points=200_000):
+    points, values, _ = adaptive_simplex(lambda c: gvr_batch(c, gamma_values), len(conc_columns),
+                                         tol, initial_step, min_step, max_points)
+    return long_format(points, conc_columns, gamma_values, ['Gamma'], {'GVR': values})
@@ -0,0 +1,99 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from GVR_Store import METADATA_KEY, decode_columns, read_gvr_store_arrays
+from Marginal_Summary import GroupedValues
+
+"""out-of-core groupby over gamma tuples: the result file is read block
+by block (CSV chunks, parquet record batches or slices of a .npz store),
+each row's gamma tuple becomes one integer key and GVR goes into a
+GroupedValues accumulator (count/sum/sum of squares and a histogram of
+the rounded GVRs), so exact medians come out without the whole sweep,
+or a formatted string per row, ever being in memory.
+
+keys pack the gamma values rounded to `decimals` as integer codes,
+Gamma1 in the highest bits, so sorting by key is sorting by
+(Gamma1, Gamma2, ...) as groupby over the float columns does"""
+
+#rows per block read from the results file
+BLOCK_ROWS = 1_000_000
+
+#bits per gamma in a key, so the k codes fit in a non-negative int64
+def _key_bits(k):
+    return 63 // k
+
+#(N x k) gamma tuples -> N integer keys
+def gamma_key(gammas, decimals=3):
+    gammas = np.atleast_2d(np.asarray(gammas, dtype=float))
+    k = gammas.shape[1]
+    codes = np.rint(gammas * 10 ** decimals).astype(np.int64)
+    bits = _key_bits(k)
+    if np.any(codes < 0) or np.any(codes >= 1 << bits):
+        raise ValueError(f"gamma values must be in [0, {(1 << bits) / 10 ** decimals:g}) to pack {k} of them into a key")
+    keys = np.zeros(len(codes), dtype=np.int64)
+    for i in range(k):
+        keys = (keys << bits) | codes[:, i]
+    return keys
+
+#integer keys -> (N x k) gamma tuples
+def gamma_from_key(keys, k=4, decimals=3):
+    keys = np.asarray(keys, dtype=np.int64)
+    bits = _key_bits(k)
+    mask = (1 << bits) - 1
+    codes = np.column_stack([(keys >> (bits * (k - 1 - i))) & mask for i in range(k)])
+    return (codes / 10 ** decimals).reshape(len(keys), k)
+
+#DataFrame blocks of at most block_rows rows with the given columns, from a CSV or a GVR_Store file
+def iter_result_blocks(path, columns, block_rows=BLOCK_ROWS):
+    ext = os.path.splitext(path)[1].lower()
+    columns = list(columns)
+    if ext == '.parquet':
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(path)
+        metadata = json.loads(parquet.schema_arrow.metadata[METADATA_KEY.encode()])
+        metadata = dict(metadata, columns=columns)
+        for batch in parquet.iter_batches(batch_size=block_rows, columns=columns):
+            yield decode_columns({col: batch.column(col).to_numpy() for col in columns}, metadata)
+    elif ext == '.npz':
+        metadata, arrays = read_gvr_store_arrays(path)
+        metadata = dict(metadata, columns=columns)
+        n_rows = len(arrays[columns[0]])
+        for start in range(0, n_rows, block_rows):
+            yield decode_columns({col: arrays[col][start:start + block_rows] for col in columns}, metadata)
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=block_rows)
+
+"""median, std and count of value for every gamma tuple of a result
+file (or a list of files, e.g. the shards of one sweep), in the layout
+of GVRCube.gamma_summary (gamma columns, {value}_median, {value}_std,
+Count), sorted by gamma tuple; rows without a value are left out, and
+so are tuples that never have one. sketch_k switches the medians to
+KLL sketches (see GroupedValues) for constant memory per tuple"""
+
+#accumulate value per gamma tuple key into groups (a new GroupedValues unless given one)
+def accumulate_gamma_tuples(path, gamma_columns=('Gamma1', 'Gamma2', 'Gamma3', 'Gamma4'), value='GVR',
+                            block_rows=BLOCK_ROWS, decimals=3, groups=None):
+    gamma_columns = list(gamma_columns)
+    groups = groups if groups is not None else GroupedValues(key_dtype=np.int64)
+    for df in iter_result_blocks(path, gamma_columns + [value], block_rows):
+        keys = gamma_key(df[gamma_columns].to_numpy(dtype=float), decimals)
+        groups.add(keys, df[value].to_numpy(dtype=float))
+    return groups
+
+#GVRCube.gamma_summary-style frame from accumulated groups
+def gamma_tuple_frame(groups, gamma_columns=('Gamma1', 'Gamma2', 'Gamma3', 'Gamma4'), value='GVR', decimals=3):
+    gamma_columns = list(gamma_columns)
+    stats = groups.summary()
+    summary = pd.DataFrame(gamma_from_key(groups.keys, len(gamma_columns), decimals), columns=gamma_columns)
+    summary[f'{value}_median'] = stats['median']
+    summary[f'{value}_std'] = stats['std']
+    summary['Count'] = stats['count']
+    return summary
+
+def gamma_tuple_summary(path, gamma_columns=('Gamma1', 'Gamma2', 'Gamma3', 'Gamma4'), value='GVR',
+                        block_rows=BLOCK_ROWS, decimals=3, value_decimals=3, sketch_k=None, seed=None):
+    groups = GroupedValues(value_decimals, np.int64, sketch_k, seed)
+    for p in ([path] if isinstance(path, str) else path):
+        accumulate_gamma_tuples(p, gamma_columns, value, block_rows, decimals, groups)
+    return gamma_tuple_frame(groups, gamma_columns, value, decimals)
@@ -0,0 +1,67 @@
+import numpy as np
+from scipy.special import comb
+from Ring_Symmetry import orbit_average
+from Table_Cache import cached_tables
+
+"""distance-dependent WT/HALO/FAST pentamer model: every HALO-FAST pair
+one position apart on the ring contributes gamma1 and every pair two
+positions apart gamma2. GVR is linear in (gamma1, gamma2), so each
+composition reduces to its multinomial coefficient and the average
+number of pairs at each distance over its arrangements"""
+
+#bump when the pair counting changes, so cached distance tables are rebuilt
+DISTANCE_TABLE_VERSION = 1
+
+#valid pentamer compositions
+compositions = []
+for wt in range(6):
+    for h in range(6 - wt):
+        for f in range(6 - wt - h):
+            if wt + h + f == 5:
+                compositions.append((wt, h, f))
+
+#compute circular distance
+def circular_distance(i, j):
+    return min(abs(i - j), 5 - abs(i - j))
+
+#compute total gamma
+def compute_gamma_total(config, gamma1, gamma2):
+    total = 0
+    for i, p1 in enumerate(config):
+        if p1 != 'HALO':
+            continue
+        for j, p2 in enumerate(config):
+            if p2 != 'FAST' or i == j:
+                continue
+            d = circular_distance(i, j)
+            total += gamma1 if d == 1 else gamma2 if d == 2 else 0
+    return total
+
+#composition array, multinomial coefficients and average (distance 1, distance 2) pair counts
+#pair counts only depend on ring distances, so each D5 orbit of arrangements is counted once
+def generate_distance_tables():
+    comp_array = np.array(compositions)
+    wt_n, h_n, f_n = comp_array[:, 0], comp_array[:, 1], comp_array[:, 2]
+    coeffs = comb(5, wt_n) * comb(5 - wt_n, h_n) * comb(5 - wt_n - h_n, f_n)
+
+    pair_table = [
+        orbit_average(['WT'] * wt + ['HALO'] * h + ['FAST'] * f,
+                      lambda p: (compute_gamma_total(p, 1, 0), compute_gamma_total(p, 0, 1)))
+        for wt, h, f in compositions
+    ]
+    return comp_array, coeffs, np.array(pair_table)
+
+#distance tables from the on-disk cache, built on the first run
+def load_distance_tables(cache_dir=None):
+    params = {'version': DISTANCE_TABLE_VERSION, 'ring_size': 5, 'species': ['WT', 'HALO', 'FAST'], 'distances': [1, 2]}
+    return cached_tables('distance_pairs', params, generate_distance_tables, cache_dir)
+
+#per-distance signals divided by [HALO] for an (N x 3) array of WT/HALO/FAST probabilities (NaN where [HALO] is 0)
+def compute_distance_signals(concentrations, distance_tables):
+    comp_array, coeffs, pair_table = distance_tables
+    conc = np.atleast_2d(np.asarray(concentrations, dtype=float))
+    probs = coeffs * np.prod(conc[:, None, :] ** comp_array[None, :, :], axis=2)
+    signals = probs @ pair_table
+    halo = conc[:, 1:2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(halo > 0, signals / halo, np.nan)
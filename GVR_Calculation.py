@@ -1,6 +1,7 @@
 import numpy as np
-import pandas as pd
 from scipy.special import comb
+from Simplex_Lattice import simplex_lattice
+from GVR_Store import save_gvr_table, long_format
 
 #compute valid pentamer combos
 compositions = []
@@ -15,6 +16,9 @@ h_vec = compositions[:, 1]
 f_vec = compositions[:, 2]
 multinomial_coeffs = comb(5, w_vec) * comb(5 - w_vec, h_vec)
 
+#PAPA weight of each composition (HALO-FAST pairs)
+papa_weights = h_vec * f_vec
+
 #compute GVR (before gamma scaling)
 def compute_base_gvr(wt_conc, halo_conc, fast_conc, alpha=1.0, beta=1.0):
     total_conc = wt_conc + halo_conc + fast_conc
@@ -26,45 +30,48 @@ def compute_base_gvr(wt_conc, halo_conc, fast_conc, alpha=1.0, beta=1.0):
     p_h = halo_conc / total_conc
     p_f = fast_conc / total_conc
 
-    #multinomial probabilities and PAPA weights
+    #multinomial probabilities
     probs = multinomial_coeffs * (p_w ** w_vec) * (p_h ** h_vec) * (p_f ** f_vec)
-    w_papa = h_vec * f_vec
 
     #G and V signal
     V = alpha * halo_conc
-    G = beta * np.sum(w_papa * probs)
+    G = beta * np.sum(papa_weights * probs)
 
     return G / V if V > 0 else np.nan
 
-#sweep over concentrations and gamma values
-step = 0.05
-concentration_range = np.arange(0.0, 1.01, step)
-gamma_values = [0.25, 0.5, 1.0, 2.0, 4.0]
+#base GVR for an (N x 3) array of WT/HALO/FAST concentrations and a vector of gammas: (N x gammas),
+#NaN where the total or [HALO] is 0; same arithmetic as compute_base_gvr, a chunk of points at a time
+def compute_base_gvr_batch(concentrations, gamma_values=(1.0,), alpha=1.0, beta=1.0, chunk_size=65536):
+    conc = np.atleast_2d(np.asarray(concentrations, dtype=float))
+    gamma = np.atleast_1d(np.asarray(gamma_values, dtype=float))
+    base = np.empty(len(conc))
+    for start in range(0, len(conc), chunk_size):
+        block = conc[start:start + chunk_size]
+        total = block.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = np.where(total > 0, block / total, np.nan)
+            probs = multinomial_coeffs * (p[:, 0:1] ** w_vec) * (p[:, 1:2] ** h_vec) * (p[:, 2:3] ** f_vec)
+            G = beta * np.sum(papa_weights * probs, axis=1)
+            V = alpha * block[:, 1]
+            base[start:start + chunk_size] = np.where(V > 0, G / V, np.nan)
+    return gamma[None, :] * base[:, None]
 
-rows = []
+if __name__ == '__main__':
+    #sweep over concentrations and gamma values
+    step = 0.05
+    gamma_values = [0.25, 0.5, 1.0, 2.0, 4.0]
 
-for wt in concentration_range:
-    for halo in concentration_range:
-        for fast in concentration_range:
-            if np.isclose(wt + halo + fast, 1.0):
-                base_gvr = compute_base_gvr(wt, halo, fast)
-                for gamma in gamma_values:
-                    scaled_gvr = gamma * base_gvr if not np.isnan(base_gvr) else np.nan
-                    rows.append({
-                        '[NPM1]_WT': wt,
-                        '[NPM1]_Halo': halo,
-                        '[NPM1]_FAST': fast,
-                        'Gamma': gamma,
-                        'GVR': scaled_gvr
-                    })
+    concentrations = simplex_lattice(3, step)
+    gvr = compute_base_gvr_batch(concentrations, gamma_values)
 
-#convert to DataFrame
-gvr_df = pd.DataFrame(rows)
-gvr_df = gvr_df.round(3)
+    #long format: concentration point outer, gamma inner
+    gvr_df = long_format(concentrations, ['[NPM1]_WT', '[NPM1]_Halo', '[NPM1]_FAST'],
+                         gamma_values, ['Gamma'], {'GVR': gvr})
+    gvr_df = gvr_df.round(3)
 
 
-#preview
-#print(gvr_df.head())
+    #preview
+    #print(gvr_df.head())
 
-#save to CSV
-gvr_df.to_csv("npm1_gvr_gamma_output.csv", index=False)
\ No newline at end of file
+    #save to CSV
+    save_gvr_table(gvr_df, "npm1_gvr_gamma_output.csv", model='base')
@@ -1,7 +1,9 @@
 import numpy as np
 import pandas as pd
-import itertools
 from scipy.special import comb
+from Simplex_Lattice import simplex_lattice
+from GVR_Store import save_gvr_table
+from Ring_Symmetry import arrangement_orbits
 
 #define gamma values
 gamma1_values = [0.25, 0.5, 1, 2, 4]
@@ -35,60 +37,55 @@ def compute_gamma_total(config, gamma1, gamma2):
                 gamma_sum += gamma2
     return gamma_sum
 
+#ring arrangements of each composition up to rotation/reflection (gamma_total only depends on ring distances)
+composition_orbits = {
+    (wt, h, f): arrangement_orbits(['WT'] * wt + ['HALO'] * h + ['FAST'] * f)
+    for wt, h, f in compositions
+}
+
 #sample concentrations
 results = []
-conc_range = np.arange(0.0, 1.01, 0.05)
-
-for wt_conc in conc_range:
-    for halo_conc in conc_range:
-        for fast_conc in conc_range:
-            total = wt_conc + halo_conc + fast_conc
-            if not np.isclose(total, 1.0):
-                continue
 
-            p_wt = wt_conc
-            p_halo = halo_conc
-            p_fast = fast_conc
+for wt_conc, halo_conc, fast_conc in simplex_lattice(3, 0.05):
+    p_wt = wt_conc
+    p_halo = halo_conc
+    p_fast = fast_conc
 
-            for gamma1 in gamma1_values:
-                for gamma2 in gamma2_values:
-                    if gamma1 <= gamma2:
-                        continue
-
-                    weighted_signal = 0
-                    for wt_count, halo_count, fast_count in compositions:
-                        p_config = (
-                            comb(5, wt_count)
-                            * comb(5 - wt_count, halo_count)
-                            * comb(5 - wt_count - halo_count, fast_count)
-                            * (p_wt ** wt_count)
-                            * (p_halo ** halo_count)
-                            * (p_fast ** fast_count)
-                        )
+    for gamma1 in gamma1_values:
+        for gamma2 in gamma2_values:
+            if gamma1 <= gamma2:
+                continue
 
-                        items = ['WT'] * wt_count + ['HALO'] * halo_count + ['FAST'] * fast_count
-                        if len(items) != 5:
-                            continue
+            weighted_signal = 0
+            for wt_count, halo_count, fast_count in compositions:
+                p_config = (
+                    comb(5, wt_count)
+                    * comb(5 - wt_count, halo_count)
+                    * comb(5 - wt_count - halo_count, fast_count)
+                    * (p_wt ** wt_count)
+                    * (p_halo ** halo_count)
+                    * (p_fast ** fast_count)
+                )
 
-                        perms = set(itertools.permutations(items))
-                        gamma_total_sum = sum(compute_gamma_total(p, gamma1, gamma2) for p in perms)
-                        avg_gamma_total = gamma_total_sum / len(perms) if perms else 0
-                        weighted_signal += avg_gamma_total * p_config
+                orbits = composition_orbits[(wt_count, halo_count, fast_count)]
+                gamma_total_sum = sum(m * compute_gamma_total(p, gamma1, gamma2) for p, m in orbits)
+                avg_gamma_total = gamma_total_sum / sum(m for _, m in orbits) if orbits else 0
+                weighted_signal += avg_gamma_total * p_config
 
-                    violet_signal = halo_conc
-                    gvr = weighted_signal / violet_signal if violet_signal > 0 else np.nan
+            violet_signal = halo_conc
+            gvr = weighted_signal / violet_signal if violet_signal > 0 else np.nan
 
-                    results.append({
-                        '[NPM1]_WT': wt_conc,
-                        '[NPM1]_Halo': halo_conc,
-                        '[NPM1]_FAST': fast_conc,
-                        'Gamma1': gamma1,
-                        'Gamma2': gamma2,
-                        'GVR': round(gvr, 3)
-                    })
+            results.append({
+                '[NPM1]_WT': wt_conc,
+                '[NPM1]_Halo': halo_conc,
+                '[NPM1]_FAST': fast_conc,
+                'Gamma1': gamma1,
+                'Gamma2': gamma2,
+                'GVR': round(gvr, 3)
+            })
 
 #convert to df
 df_distance_weighted = pd.DataFrame(results)
 df_distance_weighted = df_distance_weighted.round(3)
 
-df_distance_weighted.to_csv("npm1_gvr_distance_output.csv", index=False)
\ No newline at end of file
+save_gvr_table(df_distance_weighted, "npm1_gvr_distance_output.csv", model='distance')
\ No newline at end of file
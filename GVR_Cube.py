@@ -0,0 +1,204 @@
+import os
+import json
+import warnings
+import numpy as np
+import pandas as pd
+from Simplex_Lattice import simplex_counts, lattice_size, lattice_rank, lattice_prefix_range
+from Gamma_Tuples import count_gamma_tuples, gamma_tuple_block, gamma_tuple_rank, gamma_prefix_range
+from GVR_Store import _default_columns, infer_divisions, long_format
+
+"""dense GVR cube: sweep results stored as a memory-mapped .npy array
+of shape (concentration points, gamma tuples), with a small json
+sidecar describing both axes. rows follow simplex_counts order and
+columns follow Gamma_Tuples order ('ordered' or 'product'), or an
+explicit sorted list of gamma tuples ('table'), so a point or a gamma
+tuple is found by index arithmetic, any leading prefix (e.g. [WT] = 0.5
+or Gamma1 = 1.0) is a contiguous range, and only the pages of the file
+that get sliced are ever read"""
+
+def sidecar_path(path):
+    return os.path.splitext(path)[0] + '.json'
+
+#allocate an all-NaN cube on disk and return it opened for writing
+def create_gvr_cube(path, model, conc_columns, conc_divisions, gamma_columns, gamma_values,
+                    gamma_axis='ordered', value_columns=('GVR',), gamma_table=None):
+    metadata = {
+        'model': model,
+        'conc_columns': list(conc_columns),
+        'conc_divisions': int(conc_divisions),
+        'gamma_columns': list(gamma_columns),
+        'gamma_values': [float(g) for g in gamma_values],
+        'gamma_axis': gamma_axis,
+        'gamma_table': None if gamma_table is None else np.asarray(gamma_table, dtype=float).tolist(),
+        'value_columns': list(value_columns),
+    }
+    n_points = lattice_size(len(conc_columns), conc_divisions)
+    if gamma_axis == 'table':
+        n_gamma = len(gamma_table)
+    else:
+        n_values = len(np.unique(gamma_values)) if gamma_axis == 'ordered' else len(gamma_values)
+        n_gamma = count_gamma_tuples(n_values, len(gamma_columns), gamma_axis == 'ordered')
+    shape = (n_points, n_gamma) if len(value_columns) == 1 else (n_points, n_gamma, len(value_columns))
+
+    values = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=shape)
+    values[:] = np.nan
+    values.flush()
+    del values
+    with open(sidecar_path(path), 'w') as f:
+        json.dump(metadata, f)
+    return GVRCube(path, mode='r+')
+
+def open_gvr_cube(path, mode='r'):
+    return GVRCube(path, mode)
+
+#turn a slice, (start, stop) pair or index array into something numpy can index with
+def _selector(sel):
+    if sel is None:
+        return slice(None)
+    if isinstance(sel, tuple):
+        return slice(*sel)
+    return sel
+
+class GVRCube:
+    def __init__(self, path, mode='r'):
+        self.path = path
+        with open(sidecar_path(path)) as f:
+            self.metadata = json.load(f)
+        self.values = np.load(path, mmap_mode=mode)
+        self._points = None
+        self._gammas = None
+
+    @property
+    def n_species(self):
+        return len(self.metadata['conc_columns'])
+
+    @property
+    def divisions(self):
+        return self.metadata['conc_divisions']
+
+    @property
+    def k(self):
+        return len(self.metadata['gamma_columns'])
+
+    @property
+    def ordered(self):
+        return self.metadata['gamma_axis'] == 'ordered'
+
+    #all concentration points, in row order
+    @property
+    def points(self):
+        if self._points is None:
+            self._points = simplex_counts(self.n_species, self.divisions) / self.divisions
+        return self._points
+
+    #all gamma tuples, in column order
+    @property
+    def gammas(self):
+        if self._gammas is None:
+            if self.metadata['gamma_axis'] == 'table':
+                self._gammas = np.array(self.metadata['gamma_table'], dtype=float)
+            else:
+                n_gamma = self.values.shape[1]
+                self._gammas = gamma_tuple_block(self.metadata['gamma_values'], 0, n_gamma, self.k, self.ordered)
+        return self._gammas
+
+    #row index of each concentration point
+    def point_index(self, concentrations):
+        counts = np.rint(np.atleast_2d(concentrations) * self.divisions).astype(np.int64)
+        return lattice_rank(counts, self.divisions)
+
+    #column index of each gamma tuple
+    def gamma_index(self, gammas):
+        gammas = np.atleast_2d(np.asarray(gammas, dtype=float))
+        if self.metadata['gamma_axis'] != 'table':
+            return gamma_tuple_rank(self.metadata['gamma_values'], gammas, self.ordered)
+        lookup = {tuple(np.round(g, 6)): i for i, g in enumerate(self.gammas)}
+        return np.array([lookup[tuple(np.round(g, 6))] for g in gammas])
+
+    #(start, stop) rows whose leading concentrations equal prefix, e.g. [0.5] for [WT] = 0.5
+    def point_range(self, prefix):
+        counts = np.rint(np.asarray(prefix, dtype=float) * self.divisions).astype(np.int64)
+        return lattice_prefix_range(counts, self.n_species, self.divisions)
+
+    #(start, stop) columns whose leading gammas equal prefix, e.g. [1.0] for Gamma1 = 1.0
+    def gamma_range(self, prefix):
+        if self.metadata['gamma_axis'] != 'table':
+            return gamma_prefix_range(self.metadata['gamma_values'], prefix, self.k, self.ordered)
+        #the table is lexsorted, so a prefix is still contiguous
+        match = np.flatnonzero(np.isclose(self.gammas[:, :len(prefix)], prefix).all(axis=1))
+        return (int(match[0]), int(match[-1]) + 1) if len(match) else (0, 0)
+
+    #long-format rows (point outer, gamma inner) for a sub-block of the cube
+    def frame(self, points=None, gammas=None):
+        p_sel, g_sel = _selector(points), _selector(gammas)
+        if isinstance(p_sel, slice) or isinstance(g_sel, slice):
+            block = np.asarray(self.values[p_sel, g_sel])
+        else:
+            block = np.asarray(self.values[np.ix_(p_sel, g_sel)])
+        conc = self.points[p_sel]
+        gam = self.gammas[g_sel]
+        #explicit value count, so an empty selection still reshapes
+        block = block.reshape(len(conc), len(gam), len(self.metadata['value_columns'])).astype(float).round(3)
+        values = {col: block[:, :, i] for i, col in enumerate(self.metadata['value_columns'])}
+        return long_format(conc, self.metadata['conc_columns'], gam, self.metadata['gamma_columns'], values)
+
+    #median, std and count over all concentration points for every gamma tuple, block_size columns at a time
+    def gamma_summary(self, value=None, block_size=256):
+        value = value or self.metadata['value_columns'][0]
+        v = self.metadata['value_columns'].index(value)
+        n_gamma = self.values.shape[1]
+        median, std, count = (np.empty(n_gamma) for _ in range(3))
+        for start in range(0, n_gamma, block_size):
+            stop = min(start + block_size, n_gamma)
+            block = np.asarray(self.values[:, start:stop]).reshape(len(self.points), stop - start, -1)[:, :, v].astype(float)
+            block = block.round(3)
+            count[start:stop] = np.sum(~np.isnan(block), axis=0)
+            with warnings.catch_warnings():
+                #all-NaN columns (e.g. every point has [HALO] = 0) just give NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                median[start:stop] = np.nanmedian(block, axis=0) if len(block) else np.nan
+                std[start:stop] = np.nanstd(block, axis=0, ddof=1)
+
+        summary = pd.DataFrame(self.gammas, columns=self.metadata['gamma_columns'])
+        summary[f'{value}_median'] = median
+        summary[f'{value}_std'] = std
+        summary['Count'] = count.astype(int)
+        return summary
+
+#build a cube from a long-format result table (e.g. one of the sweep CSVs)
+def write_gvr_cube(df, path, model, conc_columns=None, gamma_columns=None, value_columns=None):
+    default_conc, default_gamma = _default_columns(df.columns)
+    conc_columns = default_conc if conc_columns is None else list(conc_columns)
+    gamma_columns = default_gamma if gamma_columns is None else list(gamma_columns)
+    if value_columns is None:
+        value_columns = [c for c in df.columns if c not in conc_columns and c not in gamma_columns]
+
+    conc = df[conc_columns].to_numpy(dtype=float)
+    divisions = infer_divisions(conc)
+    if divisions is None:
+        raise ValueError("concentrations are not on a simplex lattice, a cube cannot index them")
+
+    gam = np.round(df[gamma_columns].to_numpy(dtype=float), 6)
+    gamma_values = np.unique(gam)
+    tuples = np.unique(gam, axis=0)
+    n_values, k = len(gamma_values), len(gamma_columns)
+    gamma_table = None
+    if len(tuples) == count_gamma_tuples(n_values, k, ordered=False):
+        gamma_axis = 'product'
+    elif len(tuples) == count_gamma_tuples(n_values, k, ordered=True) and np.all(np.diff(tuples, axis=1) < 0):
+        gamma_axis = 'ordered'
+    else:
+        gamma_axis = 'table'
+        gamma_table = tuples
+
+    cube = create_gvr_cube(path, model, conc_columns, divisions, gamma_columns, gamma_values,
+                           gamma_axis, value_columns, gamma_table)
+    rows = cube.point_index(conc)
+    cols = cube.gamma_index(gam)
+    vals = df[value_columns].to_numpy(dtype=np.float32)
+    if len(value_columns) == 1:
+        cube.values[rows, cols] = vals[:, 0]
+    else:
+        cube.values[rows, cols, :] = vals
+    cube.values.flush()
+    return cube
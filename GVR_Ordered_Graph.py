@@ -1,24 +1,23 @@
-import pandas as pd
+from Chunked_Groupby import gamma_tuple_summary #reads CSV or the .npz/.parquet store in blocks
+from GVR_Cube import open_gvr_cube
 import plotly.express as px
 
-df = pd.read_csv("papa_gvr_output.csv")
+results_file = "papa_gvr_output.csv"
+#None: exact medians; a number (e.g. 200) keeps a KLL sketch of that size per gamma config instead
+sketch_k = None
 
-#unique identity for gamma set
-df['GammaCombo'] = df.apply(
-    lambda row: f"(γ1={row['Gamma1']}, γ2={row['Gamma2']}, γ3={row['Gamma3']}, γ4={row['Gamma4']})",
-    axis=1
-)
+if results_file.endswith(".npy"):
+    #dense cube: every gamma config is one column, summarized column block by column block
+    summary = open_gvr_cube(results_file).gamma_summary()
+else:
+    #read the results in blocks, grouped by an integer key per gamma config
+    summary = gamma_tuple_summary(results_file, sketch_k=sketch_k)
 
-#group by gamma config
-summary = df.groupby('GammaCombo').agg(
-    GVR_median=('GVR', 'median'),
-    GVR_std=('GVR', 'std'),
-    Gamma1=('Gamma1', 'first'),
-    Gamma2=('Gamma2', 'first'),
-    Gamma3=('Gamma3', 'first'),
-    Gamma4=('Gamma4', 'first'),
-    Count=('GVR', 'count')
-).reset_index()
+#unique identity for gamma set
+summary['GammaCombo'] = [
+    f"(γ1={g1}, γ2={g2}, γ3={g3}, γ4={g4})"
+    for g1, g2, g3, g4 in summary[['Gamma1', 'Gamma2', 'Gamma3', 'Gamma4']].itertuples(index=False)
+]
 
 #sort by median
 summary = summary.sort_values(by='GVR_median').reset_index(drop=True)
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+"""closed-form polynomial form of the GVR models: every model is a sum
+over pentamer compositions of multinomial probability x a weight that is
+linear in the gammas, i.e. a fixed homogeneous degree-5 polynomial in the
+species fractions divided by [HALO]. compiling a model keeps one row per
+composition (its exponents) and one column per gamma (coefficient x weight),
+so for any gamma vector the polynomial is just exponents + coefficients,
+evaluated on many points at once as (points x monomials) @ coefficients,
+and derivatives are exact polynomials of their own"""
+
+class GVRPolynomial:
+    def __init__(self, exponents, basis, gamma_columns, halo_index=1, normalize=False):
+        #exponents: (terms x species), basis: (terms x gammas) coefficient of each monomial per gamma
+        self.exponents = np.asarray(exponents, dtype=np.int64)
+        self.basis = np.asarray(basis, dtype=float).reshape(len(self.exponents), -1)
+        self.gamma_columns = list(gamma_columns)
+        self.halo_index = halo_index
+        #normalize: fractions are concentration / total before entering the polynomial, as in compute_base_gvr
+        self.normalize = normalize
+
+    @property
+    def n_species(self):
+        return self.exponents.shape[1]
+
+    @property
+    def degree(self):
+        return int(self.exponents.sum(axis=1).max()) if len(self.exponents) else 0
+
+    #coefficient of every monomial for one gamma vector
+    def coefficients(self, gamma):
+        return self.basis @ np.atleast_1d(np.asarray(gamma, dtype=float))
+
+    #monomial values (points x terms) from power tables, each p^e computed once per species;
+    #built terms-major so every gather is a contiguous row copy
+    def monomials(self, fractions):
+        p = np.atleast_2d(np.asarray(fractions, dtype=float))
+        out = np.ones((len(self.exponents), len(p)))
+        for k in range(self.n_species):
+            #p^0..p^degree by repeated multiplication
+            powers = np.empty((self.degree + 1, len(p)))
+            powers[0] = 1.0
+            for d in range(1, self.degree + 1):
+                powers[d] = powers[d - 1] * p[:, k]
+            out *= powers[self.exponents[:, k]]
+        return out.T
+
+    #species fractions the polynomial is evaluated at (NaN rows where the total is 0)
+    def fractions(self, concentrations):
+        conc = np.atleast_2d(np.asarray(concentrations, dtype=float))
+        if not self.normalize:
+            return conc
+        total = conc.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(total > 0, conc / total, np.nan)
+
+    #green signal per gamma column divided by [HALO]: (points x gammas), NaN where [HALO] is 0
+    def signals(self, concentrations, chunk_size=65536):
+        conc = np.atleast_2d(np.asarray(concentrations, dtype=float))
+        out = np.empty((len(conc), self.basis.shape[1]))
+        for start in range(0, len(conc), chunk_size):
+            block = conc[start:start + chunk_size]
+            numerator = self.monomials(self.fractions(block)) @ self.basis
+            halo = block[:, self.halo_index:self.halo_index + 1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                out[start:start + chunk_size] = np.where(halo > 0, numerator / halo, np.nan)
+        return out
+
+    #GVR at every point for one gamma vector
+    def evaluate(self, concentrations, gamma, alpha=1.0, beta=1.0, chunk_size=65536):
+        #fold the gammas into the monomial coefficients first: one matrix-vector product per chunk
+        compiled = GVRPolynomial(self.exponents, self.coefficients(gamma), ['GVR'], self.halo_index, self.normalize)
+        return beta / alpha * compiled.signals(concentrations, chunk_size)[:, 0]
+
+    #exact partial derivative of the numerator polynomial in species k
+    def derivative(self, k):
+        e = self.exponents[:, k]
+        keep = e > 0
+        exponents = self.exponents[keep].copy()
+        exponents[:, k] -= 1
+        return GVRPolynomial(exponents, self.basis[keep] * e[keep, None], self.gamma_columns,
+                             self.halo_index, self.normalize)
+
+    #exact dGVR/d[species] at every point: (points x species)
+    #with normalize, the numerator is homogeneous of degree d, so sum_k p_k dN/dp_k = d N
+    #and the fraction chain rule collapses to (dN/dp_j - d N) / total
+    def gradient(self, concentrations, gamma, alpha=1.0, beta=1.0):
+        conc = np.atleast_2d(np.asarray(concentrations, dtype=float))
+        gamma = np.atleast_1d(np.asarray(gamma, dtype=float))
+        p = self.fractions(conc)
+        numerator = self.monomials(p) @ self.coefficients(gamma)
+        d_numerator = np.column_stack([
+            self.derivative(k).monomials(p) @ self.derivative(k).coefficients(gamma)
+            for k in range(self.n_species)
+        ])
+        if self.normalize:
+            total = conc.sum(axis=1, keepdims=True)
+            d_numerator = (d_numerator - self.degree * numerator[:, None]) / total
+        halo = conc[:, self.halo_index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            grad = d_numerator / halo[:, None]
+            grad[:, self.halo_index] -= numerator / halo ** 2
+            grad[halo <= 0] = np.nan
+        return beta / alpha * grad
+
+    #readable table of the monomials with nonzero coefficient for one gamma vector
+    def terms(self, gamma, species_names=None):
+        names = species_names or [f'p{k}' for k in range(self.n_species)]
+        coeffs = self.coefficients(gamma)
+        keep = coeffs != 0
+        df = pd.DataFrame(self.exponents[keep], columns=names)
+        df['Coefficient'] = coeffs[keep]
+        return df
+
+"""compilers for the models in this repo; each reuses the model's own
+composition tables so the polynomial cannot drift from the loop version"""
+
+#GVR_Calculation.compute_base_gvr (x Gamma)
+def compile_base_gvr():
+    import GVR_Calculation as model
+    return GVRPolynomial(model.compositions, model.multinomial_coeffs * model.papa_weights,
+                         ['Gamma'], halo_index=1, normalize=True)
+
+#TriPAPA_GVR_Calculation.compute_split_fast_gvr with gamma as the Gamma column
+def compile_split_fast_gvr():
+    import TriPAPA_GVR_Calculation as model
+    return GVRPolynomial(model.compositions, model.multinomial_coeffs * model.papa_weights,
+                         ['Gamma'], halo_index=1, normalize=True)
+
+#WT/HALO/FAST distance model (Distance_Model, GVR_Calculation_DistanceDependent.py)
+def compile_distance_gvr():
+    from Distance_Model import load_distance_tables
+    comp_array, coeffs, pair_table = load_distance_tables()
+    return GVRPolynomial(comp_array, coeffs[:, None] * pair_table, ['Gamma1', 'Gamma2'], halo_index=1)
+
+#Split-FAST distance-bin model (Splitfast_Distance_GVR)
+def compile_split_fast_distance_gvr():
+    from Splitfast_Distance_GVR import load_bin_tables
+    comp_array, coeffs, bin_table = load_bin_tables()
+    return GVRPolynomial(comp_array, coeffs[:, None] * bin_table,
+                         ['Gamma1', 'Gamma2', 'Gamma3', 'Gamma4'], halo_index=1)
+
+#keyed by the model names used in the result stores
+MODEL_COMPILERS = {
+    'base': compile_base_gvr,
+    'split_fast': compile_split_fast_gvr,
+    'distance': compile_distance_gvr,
+    'split_fast_distance': compile_split_fast_distance_gvr,
+}
+
+def compile_model(model):
+    if model not in MODEL_COMPILERS:
+        raise ValueError(f"no polynomial compiler for model {model!r}, use one of {list(MODEL_COMPILERS)}")
+    return MODEL_COMPILERS[model]()
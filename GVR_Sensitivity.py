@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from scipy.stats import qmc
+from GVR_Calculation import compute_base_gvr_batch
+from TriPAPA_GVR_Calculation import compute_split_fast_gvr_batch, SPLIT_FAST_COLUMNS
+from Splitfast_Distance_GVR import compute_bin_signals, load_bin_tables
+
+"""global sensitivity analysis (Sobol indices) of GVR: how much of the
+GVR variance comes from each species and each gamma. inputs are drawn
+independently and uniformly within their bounds; concentrations are the
+raw amount of each species and are normalized to the simplex before the
+model sees them (the simplex itself has no independent coordinates), so
+the index of [WT] is the share of variance from the amount of WT added.
+first order indices use the Saltelli (2010) estimator and total order
+indices the Jansen (1999) one, from the A, B and AB_i matrices of the
+Saltelli scheme. all N * (d + 2) model runs are stacked into one array
+and evaluated in fixed-size chunks, in parallel when processes > 1"""
+
+#GVR of every row of X = [raw concentrations..., gammas...] for each model
+def _base_model(X, state):
+    conc = X[:, :3] / X[:, :3].sum(axis=1, keepdims=True)
+    return compute_base_gvr_batch(conc)[:, 0] * X[:, 3]
+
+def _split_fast_model(X, state):
+    conc = X[:, :4] / X[:, :4].sum(axis=1, keepdims=True)
+    return compute_split_fast_gvr_batch(conc)[:, 0] * X[:, 4]
+
+def _split_fast_distance_model(X, state):
+    if 'bin_tables' not in state:
+        state['bin_tables'] = load_bin_tables()
+    conc = X[:, :4] / X[:, :4].sum(axis=1, keepdims=True)
+    return np.sum(compute_bin_signals(conc, state['bin_tables']) * X[:, 4:], axis=1)
+
+#name -> (model, input names, default bounds)
+SENSITIVITY_MODELS = {
+    'base': (_base_model, ['[NPM1]_WT', '[NPM1]_Halo', '[NPM1]_FAST', 'Gamma'],
+             [(0.0, 1.0)] * 3 + [(0.25, 4.0)]),
+    'split_fast': (_split_fast_model, SPLIT_FAST_COLUMNS + ['Gamma'],
+                   [(0.0, 1.0)] * 4 + [(0.25, 4.0)]),
+    'split_fast_distance': (_split_fast_distance_model, SPLIT_FAST_COLUMNS + ['Gamma1', 'Gamma2', 'Gamma3', 'Gamma4'],
+                            [(0.0, 1.0)] * 4 + [(0.1, 2.5)] * 4),
+}
+
+#A, B (n x d) and the stacked AB_i matrices (d x n x d): AB_i is A with column i taken from B
+def saltelli_matrices(n_samples, bounds, rng=None, sampler='sobol'):
+    bounds = np.asarray(bounds, dtype=float)
+    d = len(bounds)
+    if sampler == 'sobol':
+        if n_samples & (n_samples - 1):
+            raise ValueError("n_samples must be a power of 2 for Sobol sampling")
+        u = qmc.Sobol(2 * d, rng=np.random.default_rng(rng)).random_base2(int(np.log2(n_samples)))
+    elif sampler == 'random':
+        u = np.random.default_rng(rng).random((n_samples, 2 * d))
+    else:
+        raise ValueError(f"unknown sampler {sampler!r}, use 'sobol' or 'random'")
+    x = bounds[:, 0] + u.reshape(n_samples, 2, d) * (bounds[:, 1] - bounds[:, 0])
+    A, B = x[:, 0], x[:, 1]
+    AB = np.repeat(A[None], d, axis=0)
+    AB[np.arange(d), :, np.arange(d)] = B.T
+    return A, B, AB
+
+_worker_state = {}
+
+def init_worker(model):
+    _worker_state.clear()
+    _worker_state['model'] = model
+
+def evaluate_chunk(X):
+    return SENSITIVITY_MODELS[_worker_state['model']][0](X, _worker_state)
+
+#model output for every row of X, chunk_size rows per task (fixed, so results do not depend on processes)
+def evaluate_model(model, X, processes=1, chunk_size=16384):
+    chunks = [X[start:start + chunk_size] for start in range(0, len(X), chunk_size)]
+    if processes > 1:
+        with Pool(processes, initializer=init_worker, initargs=(model,)) as pool:
+            return np.concatenate(list(pool.imap(evaluate_chunk, chunks)))
+    init_worker(model)
+    return np.concatenate([evaluate_chunk(chunk) for chunk in chunks])
+
+#first and total order indices from f(A), f(B) and f(AB_i) (d x n); rows index base samples,
+#so the same function serves the bootstrap with resampled columns
+def sobol_indices(fA, fB, fAB):
+    var = np.var(np.concatenate([fA, fB], axis=-1), axis=-1)
+    first = np.mean(fB * (fAB - fA), axis=-1) / var
+    total = 0.5 * np.mean((fA - fAB) ** 2, axis=-1) / var
+    return first, total
+
+"""runs the model on the Saltelli design and returns one row per input
+with S1 and ST, plus the half-width of their confidence interval from
+n_boot bootstrap resamples of the base samples. base samples where any
+of their d + 2 runs has no GVR ([HALO] = 0) are dropped"""
+
+def sobol_sensitivity(model='split_fast', n_samples=4096, bounds=None, seed=0, sampler='sobol',
+                      n_boot=100, ci=0.95, processes=1, chunk_size=16384):
+    if model not in SENSITIVITY_MODELS:
+        raise ValueError(f"unknown model {model!r}, use one of {list(SENSITIVITY_MODELS)}")
+    _, names, default_bounds = SENSITIVITY_MODELS[model]
+    bounds = default_bounds if bounds is None else bounds
+    sample_seq, boot_seq = np.random.SeedSequence(seed).spawn(2)
+    A, B, AB = saltelli_matrices(n_samples, bounds, sample_seq, sampler)
+    d = len(names)
+
+    f = evaluate_model(model, np.concatenate([A, B, AB.reshape(-1, d)]), processes, chunk_size)
+    fA, fB, fAB = f[:n_samples], f[n_samples:2 * n_samples], f[2 * n_samples:].reshape(d, n_samples)
+    keep = np.isfinite(fA) & np.isfinite(fB) & np.all(np.isfinite(fAB), axis=0)
+    fA, fB, fAB = fA[keep], fB[keep], fAB[:, keep]
+
+    first, total = sobol_indices(fA, fB, fAB)
+    result = pd.DataFrame({'Parameter': names, 'S1': first, 'ST': total})
+    if n_boot:
+        rng = np.random.default_rng(boot_seq)
+        boot_first, boot_total = np.empty((n_boot, d)), np.empty((n_boot, d))
+        for b in range(n_boot):
+            idx = rng.integers(0, len(fA), len(fA))
+            boot_first[b], boot_total[b] = sobol_indices(fA[idx], fB[idx], fAB[:, idx])
+        half = (1 - ci) / 2
+        result['S1_conf'] = (np.quantile(boot_first, 1 - half, axis=0) - np.quantile(boot_first, half, axis=0)) / 2
+        result['ST_conf'] = (np.quantile(boot_total, 1 - half, axis=0) - np.quantile(boot_total, half, axis=0)) / 2
+    result['Samples'] = int(keep.sum())
+    return result
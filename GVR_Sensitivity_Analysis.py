@@ -0,0 +1,10 @@
+from multiprocessing import cpu_count
+from GVR_Sensitivity import sobol_sensitivity
+
+if __name__ == '__main__':
+    #share of GVR variance from each species and gamma, for every model
+    for model in ('base', 'split_fast', 'split_fast_distance'):
+        indices = sobol_sensitivity(model, n_samples=8192, seed=0, processes=cpu_count()).round(4)
+        print(model)
+        print(indices.to_string(index=False))
+        indices.to_csv(f"{model}_gvr_sensitivity.csv", index=False)
@@ -0,0 +1,225 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+"""compact binary result store (.npz, or .parquet when pyarrow is
+installed): concentrations are kept as integer lattice counts, gammas
+as indices into a shared table of gamma values, both in the smallest
+unsigned dtype that fits, and result columns as float32. the metadata
+records the lattice divisions, gamma table and model so the original
+columns can be rebuilt exactly; concentrations off any lattice, or
+more distinct gammas than an index table holds, are kept as float64"""
+
+STORE_FORMATS = ('.npz', '.parquet')
+METADATA_KEY = 'gvr_store'
+
+#smallest unsigned dtype that holds indices 0..n-1
+def _index_dtype(n):
+    if n <= 2 ** 8:
+        return np.uint8
+    if n <= 2 ** 16:
+        return np.uint16
+    return np.uint32
+
+#concentration columns look like [WT] / [NPM1]_Halo, gamma columns like Gamma / Gamma1
+def _default_columns(columns):
+    conc_columns = [c for c in columns if c.startswith('[')]
+    gamma_columns = [c for c in columns if c.startswith('Gamma')]
+    return conc_columns, gamma_columns
+
+#lattice divisions that make every concentration an integer count, or None if they are not on a lattice
+#(the full lattice has a point at 1/divisions, a subset of it may not, so decimal values fall back to
+#the gcd of their codes at the smallest number of decimals that holds them)
+def infer_divisions(values, max_divisions=2 ** 16 - 1, max_decimals=6):
+    values = np.asarray(values, dtype=float)
+    positive = values[values > 0]
+    if len(positive) == 0:
+        return 1
+    candidates = [int(round(1.0 / positive.min()))]
+    for decimals in range(max_decimals + 1):
+        scaled = values * 10 ** decimals
+        if np.allclose(scaled, np.rint(scaled), rtol=0, atol=1e-6):
+            codes = np.rint(scaled).astype(np.int64)
+            candidates.append(10 ** decimals // int(np.gcd.reduce(np.append(codes.ravel(), 10 ** decimals))))
+            break
+    for divisions in candidates:
+        scaled = values * divisions
+        if 0 < divisions <= max_divisions and np.allclose(scaled, np.rint(scaled), rtol=0, atol=1e-6):
+            return divisions
+    return None
+
+#long-format rows (concentration point outer, gamma inner) from (points x species) concentrations,
+#(gammas x k) gamma tuples (or a vector of single gammas) and named (points x gammas) value arrays
+def long_format(conc, conc_columns, gammas, gamma_columns, values):
+    conc = np.asarray(conc)
+    gammas = np.asarray(gammas).reshape(-1, len(gamma_columns))
+    n_conc, n_gamma = len(conc), len(gammas)
+    data = {}
+    conc_rep = np.repeat(conc, n_gamma, axis=0)
+    for i, col in enumerate(conc_columns):
+        data[col] = conc_rep[:, i]
+    gam_rep = np.tile(gammas, (n_conc, 1))
+    for i, col in enumerate(gamma_columns):
+        data[col] = gam_rep[:, i]
+    for name, value in values.items():
+        data[name] = np.asarray(value).reshape(n_conc * n_gamma)
+    return pd.DataFrame(data)
+
+def make_metadata(columns, model, conc_columns=None, gamma_columns=None,
+                  conc_divisions=None, gamma_values=None, value_decimals=3):
+    default_conc, default_gamma = _default_columns(columns)
+    conc_columns = default_conc if conc_columns is None else list(conc_columns)
+    gamma_columns = default_gamma if gamma_columns is None else list(gamma_columns)
+    if gamma_values is not None:
+        gamma_values = [float(g) for g in np.unique(np.round(gamma_values, 6))]
+    return {
+        'model': model,
+        'columns': list(columns),
+        'conc_columns': conc_columns,
+        'conc_divisions': conc_divisions,
+        'gamma_columns': gamma_columns,
+        'gamma_values': gamma_values,
+        'value_columns': [c for c in columns if c not in conc_columns and c not in gamma_columns],
+        'value_decimals': value_decimals,
+    }
+
+#DataFrame -> dict of compact column arrays
+def encode_columns(df, metadata):
+    arrays = {}
+    divisions = metadata['conc_divisions']
+    gamma_values = metadata['gamma_values']
+    for col in metadata['conc_columns']:
+        values = df[col].to_numpy(dtype=float)
+        if divisions is None:
+            arrays[col] = values
+        else:
+            arrays[col] = np.rint(values * divisions).astype(_index_dtype(divisions + 1))
+    for col in metadata['gamma_columns']:
+        values = df[col].to_numpy(dtype=float)
+        if gamma_values is None:
+            arrays[col] = values
+            continue
+        table = np.asarray(gamma_values)
+        idx = np.clip(np.searchsorted(table, values - 1e-9), 0, len(table) - 1)
+        if not np.allclose(table[idx], values):
+            raise ValueError(f"column {col} has gamma values missing from the gamma table")
+        arrays[col] = idx.astype(_index_dtype(len(table)))
+    for col in metadata['value_columns']:
+        arrays[col] = df[col].to_numpy(dtype=np.float32)
+    return arrays
+
+#dict of compact column arrays -> DataFrame with the original columns and values
+def decode_columns(arrays, metadata):
+    data = {}
+    divisions = metadata['conc_divisions']
+    gamma_values = metadata['gamma_values']
+    decimals = metadata['value_decimals']
+    for col in metadata['columns']:
+        values = np.asarray(arrays[col])
+        if col in metadata['conc_columns']:
+            data[col] = values.astype(float) if divisions is None else values / divisions
+        elif col in metadata['gamma_columns']:
+            data[col] = values.astype(float) if gamma_values is None else np.asarray(gamma_values)[values]
+        else:
+            values = values.astype(float)
+            data[col] = values.round(decimals) if decimals is not None else values
+    return pd.DataFrame(data)
+
+"""writer that takes DataFrame batches (e.g. the blocks of a streaming
+sweep); parquet batches go straight to disk as row groups, npz batches
+are kept encoded in memory and saved on close"""
+
+class GVRStoreWriter:
+    def __init__(self, path, metadata):
+        self.path = path
+        self.metadata = metadata
+        self.format = os.path.splitext(path)[1].lower()
+        if self.format not in STORE_FORMATS:
+            raise ValueError(f"unsupported store format {self.format!r}, use one of {STORE_FORMATS}")
+        self._parts = []
+        self._parquet_writer = None
+
+    def append(self, df):
+        arrays = encode_columns(df, self.metadata)
+        if self.format == '.npz':
+            self._parts.append(arrays)
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.table({col: arrays[col] for col in self.metadata['columns']})
+        if self._parquet_writer is None:
+            schema = table.schema.with_metadata({METADATA_KEY: json.dumps(self.metadata)})
+            self._parquet_writer = pq.ParquetWriter(self.path, schema)
+        self._parquet_writer.write_table(table.replace_schema_metadata(self._parquet_writer.schema.metadata))
+
+    def close(self):
+        if self.format == '.npz':
+            arrays = {}
+            for col in self.metadata['columns']:
+                parts = [p[col] for p in self._parts]
+                arrays[col] = np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+            np.savez_compressed(self.path, __metadata__=np.array(json.dumps(self.metadata)), **arrays)
+            self._parts = []
+        elif self._parquet_writer is not None:
+            self._parquet_writer.close()
+        else:
+            #nothing appended, still leave a readable empty file
+            self.append(pd.DataFrame({col: [] for col in self.metadata['columns']}))
+            self._parquet_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+#write a whole DataFrame to a binary store
+def write_gvr_store(df, path, model, conc_columns=None, gamma_columns=None,
+                    conc_divisions=None, gamma_values=None, value_decimals=3):
+    metadata = make_metadata(df.columns, model, conc_columns, gamma_columns,
+                             conc_divisions, gamma_values, value_decimals)
+    if metadata['conc_divisions'] is None and metadata['conc_columns']:
+        metadata['conc_divisions'] = infer_divisions(df[metadata['conc_columns']].to_numpy())
+    if metadata['gamma_values'] is None and metadata['gamma_columns']:
+        values = np.unique(np.round(df[metadata['gamma_columns']].to_numpy(dtype=float), 6))
+        metadata['gamma_values'] = [float(g) for g in values] if len(values) <= 2 ** 16 else None
+    with GVRStoreWriter(path, metadata) as writer:
+        writer.append(df)
+
+#metadata and compact column arrays of a binary store
+def read_gvr_store_arrays(path):
+    if os.path.splitext(path)[1].lower() == '.npz':
+        with np.load(path) as store:
+            metadata = json.loads(str(store['__metadata__']))
+            return metadata, {col: store[col] for col in metadata['columns']}
+    import pyarrow.parquet as pq
+    table = pq.read_table(path)
+    metadata = json.loads(table.schema.metadata[METADATA_KEY.encode()])
+    return metadata, {col: table.column(col).to_numpy() for col in metadata['columns']}
+
+def read_gvr_store(path):
+    metadata, arrays = read_gvr_store_arrays(path)
+    return decode_columns(arrays, metadata)
+
+#save a result table, as CSV, a binary store or a dense .npy cube (see GVR_Cube) depending on the file extension:
+#the sweep scripts write CSV, and giving them a .npz or .parquet filename writes the compact binary store instead
+def save_gvr_table(df, path, model, **store_kwargs):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in STORE_FORMATS:
+        write_gvr_store(df, path, model, **store_kwargs)
+    elif ext == '.npy':
+        from GVR_Cube import write_gvr_cube
+        write_gvr_cube(df, path, model, **store_kwargs)
+    else:
+        df.to_csv(path, index=False)
+
+#load a result table written by save_gvr_table (or any of the CSVs)
+def load_gvr_table(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in STORE_FORMATS:
+        return read_gvr_store(path)
+    if ext == '.npy':
+        from GVR_Cube import open_gvr_cube
+        return open_gvr_cube(path).frame()
+    return pd.read_csv(path)
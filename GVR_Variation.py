@@ -0,0 +1,212 @@
+import warnings
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from scipy.stats import norm, qmc
+from Distance_Model import load_distance_tables, compute_distance_signals
+from Quantile_Sketch import QuantileSketch
+from GVR_Store import long_format
+
+"""vectorized Monte Carlo engine for the concentration-variation model:
+concentrations around each median point are drawn as clipped normal
+samples and renormalized, and GVR for every sample and every
+(gamma1, gamma2) pair comes from the precomputed distance tables as
+array operations, so the arrangement averages are computed once per
+run instead of once per sample"""
+
+VARIATION_COLUMNS = ['[NPM1]_WT_median', '[NPM1]_Halo_median', '[NPM1]_FAST_median']
+
+"""samplers for the concentration noise: 'random' is plain pseudo-random
+normal draws; 'sobol' and 'halton' are scrambled low-discrepancy points
+and 'lhs' a Latin hypercube, mapped through the Gaussian inverse CDF, 
+which spread the samples evenly over each species' distribution so 
+the median/std settle with far fewer samples. every point gets its own 
+scrambling, so the estimates stay unbiased and replicates independent"""
+
+SAMPLERS = ('random', 'sobol', 'halton', 'lhs')
+QMC_ENGINES = {'sobol': qmc.Sobol, 'halton': qmc.Halton, 'lhs': qmc.LatinHypercube}
+
+#the np.random module or a RandomState still has to seed a Generator for scipy's qmc engines
+def _as_generator(rng):
+    if isinstance(rng, np.random.Generator):
+        return rng
+    return np.random.default_rng(rng.randint(0, 2 ** 31 - 1))
+
+#(n_samples x n_species) standard normal draws from one of the QMC samplers
+def qmc_normal_draws(sampler, n_samples, n_species, rng):
+    engine = QMC_ENGINES[sampler](n_species, rng=_as_generator(rng))
+    with warnings.catch_warnings():
+        #sobol balance is best at powers of 2 but any n still works
+        warnings.simplefilter('ignore', UserWarning)
+        u = engine.random(n_samples)
+    #keep the inverse CDF finite for points that land exactly on 0
+    return norm.ppf(np.clip(u, 1e-12, 1 - 1e-12))
+
+#independent generator for each point index in [start, stop): depends only on (seed, index)
+def point_generators(seed, start, stop):
+    return [np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i,))) for i in range(start, stop)]
+
+#clipped normal samples around each median point: (points x samples x species)
+#rng is one generator shared by all points, or a list with one generator per point
+def sample_concentrations(medians, n_samples, std_dev, rng=np.random, sampler='random'):
+    if sampler not in SAMPLERS:
+        raise ValueError(f"unknown sampler {sampler!r}, use one of {SAMPLERS}")
+    medians = np.atleast_2d(np.asarray(medians, dtype=float))
+    n_species = medians.shape[1]
+    rngs = rng if isinstance(rng, (list, tuple)) else [rng] * len(medians)
+    samples = np.empty((len(medians), n_samples, n_species))
+    for i, med in enumerate(medians):
+        if sampler == 'random':
+            #one species after another, n_samples each, like separate normal() calls
+            samples[i] = rngs[i].normal(med[:, None], std_dev, (n_species, n_samples)).T
+        else:
+            samples[i] = med + std_dev * qmc_normal_draws(sampler, n_samples, n_species, rngs[i])
+    return np.clip(samples, 0, 1)
+
+#GVR for every sample and gamma pair: (points x samples x pairs), NaN where a sample has no HALO or sums to 0
+def sample_gvr(samples, gamma_pairs, distance_tables):
+    flat = samples.reshape(-1, samples.shape[-1])
+    total = flat.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = np.where(total > 0, flat / total, np.nan)
+    gvr = compute_distance_signals(normalized, distance_tables) @ np.asarray(gamma_pairs, dtype=float).T
+    return gvr.reshape(samples.shape[0], samples.shape[1], -1)
+
+#median, std and any extra quantiles across samples: each (points x pairs)
+def summarize_samples(gvr, quantiles=()):
+    with warnings.catch_warnings():
+        #points where every sample is NaN just give NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        stats = {'GVR_median': np.nanmedian(gvr, axis=1), 'GVR_std': np.nanstd(gvr, axis=1)}
+        for q in quantiles:
+            stats[f'GVR_q{q * 100:g}'] = np.nanquantile(gvr, q, axis=1)
+    return stats
+
+"""streamed summary for large n_samples: each point's samples are drawn
+and evaluated sample_block at a time (continuing the same per-point
+streams), GVR_std comes from running sums and the median/quantiles from
+a KLL sketch per (point, gamma pair), so memory stays bounded however
+many samples there are. the draws come in a different order than one
+n_samples draw, and sketch quantiles are off by ~1.7 / sketch_k in rank,
+so results match the one-shot run statistically, not bit for bit"""
+
+def summarize_sample_blocks(medians, gamma_pairs, distance_tables, n_samples, std_dev, rng, sampler,
+                            sample_block, quantiles=(), sketch_k=200, sketch_seed=None):
+    shape = (len(medians), len(gamma_pairs))
+    keys = np.arange(shape[0] * shape[1]).reshape(shape[0], 1, shape[1])
+    sketch = QuantileSketch(sketch_k, sketch_seed)
+    count, total, sumsq = (np.zeros(shape) for _ in range(3))
+    for start in range(0, n_samples, sample_block):
+        samples = sample_concentrations(medians, min(sample_block, n_samples - start), std_dev, rng, sampler)
+        gvr = sample_gvr(samples, gamma_pairs, distance_tables)
+        sketch.add(np.broadcast_to(keys, gvr.shape).ravel(), gvr.ravel())
+        finite = np.isfinite(gvr)
+        gvr = np.where(finite, gvr, 0)
+        count += finite.sum(axis=1)
+        total += gvr.sum(axis=1)
+        sumsq += (gvr ** 2).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        std = np.where(count > 0, np.sqrt(np.maximum(sumsq / count - mean ** 2, 0)), np.nan)
+    q = sketch.quantiles(keys.ravel(), [0.5] + list(quantiles))
+    stats = {'GVR_median': q[:, 0].reshape(shape), 'GVR_std': std}
+    for i, p in enumerate(quantiles):
+        stats[f'GVR_q{p * 100:g}'] = q[:, i + 1].reshape(shape)
+    return stats
+
+#long-format rows (point outer, gamma pair inner)
+def variation_frame(medians, gamma_pairs, stats, conc_columns=VARIATION_COLUMNS):
+    return long_format(np.atleast_2d(medians), conc_columns, gamma_pairs, ['Gamma1', 'Gamma2'], stats)
+
+"""per-process state for run_variation, set once by the pool initializer 
+(or directly for a serial run); tasks are (start, stop) point ranges"""
+
+_worker_state = {}
+
+def init_worker(medians, gamma_pairs, distance_tables, n_samples, std_dev, quantiles, seed, rng, sampler,
+                sample_block=None, sketch_k=200):
+    _worker_state.update(
+        medians=medians, gamma_pairs=gamma_pairs, distance_tables=distance_tables,
+        n_samples=n_samples, std_dev=std_dev, quantiles=quantiles, seed=seed, rng=rng, sampler=sampler,
+        sample_block=sample_block, sketch_k=sketch_k,
+    )
+
+def compute_variation_chunk(task):
+    start, stop = task
+    state = _worker_state
+    block = state['medians'][start:stop]
+    rng = state['rng'] if state['seed'] is None else point_generators(state['seed'], start, stop)
+    if state['sample_block'] is not None:
+        #the sketch compactions draw from their own stream of the chunk (or from rng without a seed)
+        sketch_seed = (_as_generator(rng) if state['seed'] is None
+                       else np.random.SeedSequence(state['seed'], spawn_key=(start, 1)))
+        stats = summarize_sample_blocks(block, state['gamma_pairs'], state['distance_tables'], state['n_samples'],
+                                        state['std_dev'], rng, state['sampler'], state['sample_block'],
+                                        state['quantiles'], state['sketch_k'], sketch_seed)
+        return variation_frame(block, state['gamma_pairs'], stats)
+    samples = sample_concentrations(block, state['n_samples'], state['std_dev'], rng, state['sampler'])
+    stats = summarize_samples(sample_gvr(samples, state['gamma_pairs'], state['distance_tables']), state['quantiles'])
+    return variation_frame(block, state['gamma_pairs'], stats)
+
+"""run the whole variation sweep; median points are processed in 
+chunks of at most chunk_points, fewer if needed to keep the
+(points x samples x compositions) working set around max_elements values.
+
+with a seed, every median point draws from its own SeedSequence child 
+stream (spawn_key = point index) and the chunks depend only on the 
+inputs, never on processes, so results are bit-identical on any number 
+of cores; without one, all points share rng (the global np.random 
+state by default) serially.
+
+with sample_block set, samples are streamed through
+summarize_sample_blocks (KLL sketches of sketch_k items) instead of
+being held all at once"""
+
+def run_variation(medians, gamma_pairs, n_samples=100, std_dev=0.05, quantiles=(),
+                  rng=np.random, max_elements=2_000_000, seed=None, processes=1, chunk_points=64, sampler='random',
+                  sample_block=None, sketch_k=200):
+    if seed is None and processes > 1:
+        raise ValueError("parallel variation runs need a seed so each point gets its own stream")
+    distance_tables = load_distance_tables()
+    medians = np.atleast_2d(medians)
+    gamma_pairs = np.atleast_2d(np.asarray(gamma_pairs, dtype=float))
+    samples_held = n_samples if sample_block is None else min(sample_block, n_samples)
+    chunk = max(1, min(chunk_points, max_elements // (samples_held * len(distance_tables[0]))))
+    tasks = [(start, min(start + chunk, len(medians))) for start in range(0, len(medians), chunk)]
+
+    #with a seed the shared rng is never used, and the np.random module default cannot be pickled for spawned workers
+    initargs = (medians, gamma_pairs, distance_tables, n_samples, std_dev, tuple(quantiles), seed,
+                rng if seed is None else None, sampler, sample_block, sketch_k)
+    if processes > 1:
+        with Pool(processes, initializer=init_worker, initargs=initargs) as pool:
+            frames = list(pool.imap(compute_variation_chunk, tasks))
+    else:
+        init_worker(*initargs)
+        frames = [compute_variation_chunk(task) for task in tasks]
+    return pd.concat(frames, ignore_index=True)
+
+"""convergence check: rerun the variation sweep n_replicates times with 
+independent seeds for each sampler and sample size, and report how much 
+GVR_median and GVR_std move between replicates (their standard deviation 
+across replicates, averaged over points and gamma pairs). a sampler that 
+reaches the same spread with fewer samples needs fewer model evaluations"""
+
+def convergence_report(medians, gamma_pairs, sample_sizes=(16, 32, 64, 128, 256), samplers=SAMPLERS,
+                       n_replicates=8, std_dev=0.05, seed=0, processes=1):
+    medians = np.atleast_2d(medians)
+    n_pairs = len(np.atleast_2d(gamma_pairs))
+    rows = []
+    for sampler in samplers:
+        for n_samples in sample_sizes:
+            reps = [run_variation(medians, gamma_pairs, n_samples, std_dev, seed=[seed, rep],
+                                  processes=processes, sampler=sampler)
+                    for rep in range(n_replicates)]
+            row = {'Sampler': sampler, 'Samples': n_samples,
+                   'Evaluations': n_samples * len(medians) * n_pairs * n_replicates}
+            for stat in ('GVR_median', 'GVR_std'):
+                values = np.stack([r[stat].to_numpy() for r in reps])
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    row[f'{stat}_spread'] = np.nanmean(np.nanstd(values, axis=0, ddof=1))
+            rows.append(row)
+    return pd.DataFrame(rows)
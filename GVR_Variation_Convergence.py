@@ -0,0 +1,20 @@
+from multiprocessing import cpu_count
+from Simplex_Lattice import simplex_lattice
+from GVR_Variation import convergence_report
+
+if __name__ == '__main__':
+    #same gamma pairs and noise as GVR_Calculation_Distance&VariationDependant.py
+    gamma1_values = [0.25, 0.5, 1, 2, 4]
+    gamma2_values = [0.125, 0.5, 1, 2]
+    gamma_pairs = [(g1, g2) for g1 in gamma1_values for g2 in gamma2_values if g1 > g2]
+    std_dev = 0.05
+
+    #coarser lattice keeps the replicated runs quick
+    medians = simplex_lattice(3, 0.1)
+
+    #spread of GVR_median / GVR_std between independent replicates, per sampler and sample size
+    report = convergence_report(medians, gamma_pairs, sample_sizes=(16, 32, 64, 128, 256, 512),
+                                n_replicates=8, std_dev=std_dev, seed=0, processes=cpu_count())
+    report = report.round(5)
+    print(report.to_string(index=False))
+    report.to_csv("npm1_gvr_variation_convergence.csv", index=False)
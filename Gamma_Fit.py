@@ -0,0 +1,151 @@
+import warnings
+import numpy as np
+import pandas as pd
+from multiprocessing import Pool
+from scipy.optimize import nnls
+from Splitfast_Distance_GVR import compute_bin_signals, load_bin_tables
+from Gamma_Tuples import iter_gamma_blocks
+
+"""inverse problem: every model is linear in its gammas once its tables
+are fixed, GVR = signals @ gamma, so fitting gamma to measured
+(concentration, GVR) points is a least squares problem on the
+(points x gammas) signal matrix. by default that is the Split-FAST
+distance model (compute_bin_signals); signal_func can be any
+concentrations -> (N x gammas) function, e.g. OligomerModel.signals or
+GVRPolynomial.signals. the ordering of the ordered sweeps
+(gamma1 >= gamma2 >= ... >= min_gamma) becomes plain non-negativity by
+writing gamma as cumulative sums of non-negative steps,
+gamma_i = min_gamma + d_i + ... + d_k, and solving NNLS for the steps.
+Rank in the fit tells how many gamma combinations the data pins down:
+with uniformly random arrangements every composition has the same
+distance/bin profile (the Split-FAST bin table and the oligomer distance
+tables are rank 1), so there only one combination of the gammas is
+identified and NNLS returns one of the equally good tuples"""
+
+def _gamma_columns(k):
+    return ['Gamma'] if k == 1 else [f'Gamma{i + 1}' for i in range(k)]
+
+#(points x gammas) design matrix and observations, without points that have no GVR ([HALO] = 0 or missing data),
+#and the mask of the points that were kept
+def fit_design(concentrations, gvr, signal_func=None):
+    if signal_func is None:
+        bin_tables = load_bin_tables()
+        signal_func = lambda c: compute_bin_signals(c, bin_tables)
+    signals = np.asarray(signal_func(np.asarray(concentrations, dtype=float)), dtype=float)
+    gvr = np.asarray(gvr, dtype=float).ravel()
+    keep = np.all(np.isfinite(signals), axis=1) & np.isfinite(gvr)
+    return signals[keep], gvr[keep], keep
+
+#least-squares gamma for a design matrix; ordered keeps gamma1 >= gamma2 >= ... >= min_gamma, otherwise just >= min_gamma
+def solve_gamma(signals, gvr, ordered=True, min_gamma=0.0, weights=None):
+    k = signals.shape[1]
+    #gamma = min_gamma + steps @ cumulative.T, cumulative[i, j] = 1 for j >= i
+    cumulative = np.triu(np.ones((k, k))) if ordered else np.eye(k)
+    target = gvr - signals.sum(axis=1) * min_gamma
+    design = signals @ cumulative
+    if weights is not None:
+        w = np.sqrt(np.asarray(weights, dtype=float))
+        design, target = design * w[:, None], target * w
+    steps, _ = nnls(design, target)
+    return min_gamma + cumulative @ steps
+
+#rank of the design and, for each gamma, whether the data determine it on its own
+#(its unit vector lies in the row space of signals)
+def identified_gammas(signals):
+    k = signals.shape[1]
+    if len(signals) == 0:
+        return 0, np.zeros(k, dtype=bool)
+    _, s, vt = np.linalg.svd(signals, full_matrices=False)
+    rank = int(np.sum(s > s.max() * max(signals.shape) * np.finfo(float).eps)) if s.max() > 0 else 0
+    return rank, np.sum(vt[:rank] ** 2, axis=0) > 1 - 1e-8
+
+def _warn_rank(rank, k):
+    if rank < k:
+        warnings.warn(f"the data only determine {rank} combination(s) of the {k} gammas, so the fitted "
+                      "gammas are one of many equally good tuples", RuntimeWarning, stacklevel=3)
+
+def _fit_row(signals, gvr, gamma, rank):
+    residual = signals @ gamma - gvr
+    row = dict(zip(_gamma_columns(len(gamma)), gamma))
+    row['RMSE'] = float(np.sqrt(np.mean(residual ** 2))) if len(gvr) else np.nan
+    row['Rank'] = rank
+    row['Points'] = len(gvr)
+    return row
+
+#fit gamma to observed GVRs at the given (N x species) concentrations: one row with the gammas, RMSE, Rank and Points
+def fit_gamma(concentrations, gvr, ordered=True, min_gamma=0.0, weights=None, signal_func=None):
+    signals, observed, keep = fit_design(concentrations, gvr, signal_func)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float).ravel()[keep]
+    gamma = solve_gamma(signals, observed, ordered, min_gamma, weights)
+    rank, _ = identified_gammas(signals)
+    _warn_rank(rank, signals.shape[1])
+    return pd.DataFrame([_fit_row(signals, observed, gamma, rank)])
+
+"""score every gamma tuple of a sweep grid against the observations
+without sweeping: RSS(g) = |y|^2 - 2 g.(A^T y) + g.(A^T A) g only needs
+the vector A^T y and the small matrix A^T A, so the ranking that took a full
+ordered sweep plus sorted medians is a few small matrix products"""
+
+def rank_gamma_tuples(concentrations, gvr, gamma_vals, ordered=True, top=10, block_size=65536, signal_func=None):
+    signals, observed, _ = fit_design(concentrations, gvr, signal_func)
+    gram, projected, norm = signals.T @ signals, signals.T @ observed, observed @ observed
+    best_gammas, best_rss = np.empty((0, signals.shape[1])), np.empty(0)
+    for _, gammas in iter_gamma_blocks(gamma_vals, block_size, signals.shape[1], ordered):
+        rss = norm - 2 * gammas @ projected + np.einsum('ij,jk,ik->i', gammas, gram, gammas)
+        best_gammas = np.concatenate([best_gammas, gammas])
+        best_rss = np.concatenate([best_rss, rss])
+        keep = np.argsort(best_rss, kind='stable')[:top]
+        best_gammas, best_rss = best_gammas[keep], best_rss[keep]
+    ranking = pd.DataFrame(best_gammas, columns=_gamma_columns(signals.shape[1]))
+    ranking['RMSE'] = np.sqrt(np.maximum(best_rss, 0) / max(len(observed), 1))
+    return ranking
+
+"""bootstrap: resample the observed points with replacement and refit.
+replicate b always draws from SeedSequence(seed, spawn_key=(b,)), so the
+replicates (and the intervals) are the same whatever the number of
+processes; workers get the design matrix once through the initializer.
+a gamma the data do not determine gets NaN for Std, Lower and Upper:
+its replicates only reflect which of the equally good tuples NNLS picks,
+not how well it is known"""
+
+_worker_state = {}
+
+def init_worker(signals, gvr, ordered, min_gamma, seed):
+    _worker_state.update(signals=signals, gvr=gvr, ordered=ordered, min_gamma=min_gamma, seed=seed)
+
+def fit_bootstrap_block(task):
+    start, stop = task
+    state = _worker_state
+    n = len(state['gvr'])
+    fits = []
+    for b in range(start, stop):
+        rng = np.random.default_rng(np.random.SeedSequence(state['seed'], spawn_key=(b,)))
+        sample = rng.integers(0, n, n)
+        fits.append(solve_gamma(state['signals'][sample], state['gvr'][sample], state['ordered'], state['min_gamma']))
+    return np.array(fits).reshape(-1, state['signals'].shape[1])
+
+#point fit plus percentile confidence intervals from n_boot bootstrap refits
+def bootstrap_gamma(concentrations, gvr, n_boot=1000, ci=0.95, ordered=True, min_gamma=0.0, seed=0,
+                    processes=1, block_size=50, signal_func=None):
+    signals, observed, _ = fit_design(concentrations, gvr, signal_func)
+    estimate = solve_gamma(signals, observed, ordered, min_gamma)
+    rank, identified = identified_gammas(signals)
+    _warn_rank(rank, signals.shape[1])
+    tasks = [(start, min(start + block_size, n_boot)) for start in range(0, n_boot, block_size)]
+    initargs = (signals, observed, ordered, min_gamma, seed)
+    if processes > 1:
+        with Pool(processes, initializer=init_worker, initargs=initargs) as pool:
+            replicates = np.concatenate(list(pool.imap(fit_bootstrap_block, tasks)))
+    else:
+        init_worker(*initargs)
+        replicates = np.concatenate([fit_bootstrap_block(task) for task in tasks])
+
+    alpha = (1 - ci) / 2
+    return pd.DataFrame({
+        'Estimate': estimate,
+        'Std': np.where(identified, replicates.std(axis=0, ddof=1), np.nan),
+        'Lower': np.where(identified, np.quantile(replicates, alpha, axis=0), np.nan),
+        'Upper': np.where(identified, np.quantile(replicates, 1 - alpha, axis=0), np.nan),
+        'Rank': rank,
+    }, index=_gamma_columns(signals.shape[1]))
@@ -1,16 +1,8 @@
-import pandas as pd
+from Marginal_Summary import load_marginal #reads the .marginals.npz sidecar, or the results when there is none
 import matplotlib.pyplot as plt
 
-df = pd.read_csv("split_fast_gvr_with_gamma.csv")
-
-#delete null GVRs
-df = df.dropna(subset=["GVR"])
-
-#group by halo concentration
-grouped = df.groupby("Gamma")
-
-#compute mean and std of GVR at each halo conc
-summary = grouped["GVR"].agg(['mean', 'std']).reset_index()
+#compute mean and std of GVR at each gamma value (null GVRs are left out)
+summary = load_marginal("split_fast_gvr_with_gamma.csv", "Gamma")
 
 #plot with error bars
 plt.figure(figsize=(8, 6))
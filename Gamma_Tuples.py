@@ -0,0 +1,90 @@
+import numpy as np
+from scipy.special import comb
+
+"""enumerate (g1, g2, ..., gk) gamma tuples by rank, either the full
+product of gamma values or only the strictly ordered g1 > g2 > ... > gk
+tuples, in the same order as the nested sweep loops. blocks of ranks
+can be generated independently, so a sweep can stream them without
+materializing or filtering the full product"""
+
+#number of gamma tuples of length k drawn from n_values values
+def count_gamma_tuples(n_values, k=4, ordered=True):
+    if ordered:
+        return int(comb(n_values, k, exact=True))
+    return n_values ** k
+
+#strictly decreasing index tuples (i1 > i2 > ... > ik) for ranks [start, stop)
+def ordered_index_block(n_values, start, stop, k=4):
+    ranks = np.arange(start, stop, dtype=np.int64)
+    indices = np.empty((len(ranks), k), dtype=np.int64)
+    #combinatorial number system: rank = C(i1, k) + C(i2, k - 1) + ... + C(ik, 1)
+    for pos in range(k):
+        binom = np.array([comb(c, k - pos, exact=True) for c in range(n_values)], dtype=np.int64)
+        idx = np.searchsorted(binom, ranks, side='right') - 1
+        indices[:, pos] = idx
+        ranks = ranks - binom[idx]
+    return indices
+
+#index tuples of the full product for ranks [start, stop)
+def product_index_block(n_values, start, stop, k=4):
+    ranks = np.arange(start, stop, dtype=np.int64)
+    return np.stack(np.unravel_index(ranks, (n_values,) * k), axis=1)
+
+#(stop - start) x k array of gamma tuples for ranks [start, stop)
+def gamma_tuple_block(gamma_vals, start, stop, k=4, ordered=True):
+    if ordered:
+        values = np.unique(gamma_vals)
+        return values[ordered_index_block(len(values), start, stop, k)]
+    values = np.asarray(gamma_vals)
+    return values[product_index_block(len(values), start, stop, k)]
+
+#all gamma tuples as an (M x k) array
+def gamma_tuples(gamma_vals, k=4, ordered=True):
+    n_values = len(np.unique(gamma_vals)) if ordered else len(gamma_vals)
+    return gamma_tuple_block(gamma_vals, 0, count_gamma_tuples(n_values, k, ordered), k, ordered)
+
+#stream gamma tuples as (start rank, block) pairs of at most block_size tuples
+def iter_gamma_blocks(gamma_vals, block_size, k=4, ordered=True):
+    n_values = len(np.unique(gamma_vals)) if ordered else len(gamma_vals)
+    total = count_gamma_tuples(n_values, k, ordered)
+    for start in range(0, total, block_size):
+        yield start, gamma_tuple_block(gamma_vals, start, min(start + block_size, total), k, ordered)
+
+#indices of gamma values in their table, checking every value is present
+def _value_indices(values, gammas):
+    idx = np.clip(np.searchsorted(values, np.asarray(gammas, dtype=float) - 1e-9), 0, len(values) - 1)
+    if not np.allclose(values[idx], gammas):
+        raise ValueError("gamma tuple contains values outside gamma_vals")
+    return idx
+
+#rank of each gamma tuple (rows of an M x k array) in enumeration order
+def gamma_tuple_rank(gamma_vals, tuples, ordered=True):
+    tuples = np.atleast_2d(tuples)
+    k = tuples.shape[1]
+    if ordered:
+        idx = _value_indices(np.unique(gamma_vals), tuples)
+        if np.any(np.diff(idx, axis=1) >= 0):
+            raise ValueError("ordered gamma tuples must be strictly decreasing")
+        return sum(np.rint(comb(idx[:, pos], k - pos)).astype(np.int64) for pos in range(k))
+    values = np.asarray(gamma_vals, dtype=float)
+    order = np.argsort(values)
+    idx = order[_value_indices(values[order], tuples)]
+    return np.ravel_multi_index(tuple(idx.T), (len(values),) * k)
+
+#contiguous [start, stop) range of ranks whose leading gammas equal prefix
+def gamma_prefix_range(gamma_vals, prefix, k=4, ordered=True):
+    j = len(prefix)
+    if j == 0:
+        n_values = len(np.unique(gamma_vals)) if ordered else len(gamma_vals)
+        return 0, count_gamma_tuples(n_values, k, ordered)
+    if ordered:
+        idx = _value_indices(np.unique(gamma_vals), [prefix])[0]
+        if np.any(np.diff(idx) >= 0) or idx[-1] < k - j:
+            return 0, 0
+        first = np.concatenate([idx, np.arange(k - j - 1, -1, -1)])
+        start = int(sum(comb(int(first[pos]), k - pos, exact=True) for pos in range(k)))
+        return start, start + int(comb(int(idx[-1]), k - j, exact=True))
+    n_values = len(gamma_vals)
+    first = list(prefix) + [gamma_vals[0]] * (k - j)
+    start = int(gamma_tuple_rank(gamma_vals, [first], ordered=False)[0])
+    return start, start + n_values ** (k - j)
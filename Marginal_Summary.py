@@ -0,0 +1,229 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from GVR_Store import load_gvr_table
+from Quantile_Sketch import QuantileSketch, interpolate_ranks
+
+"""pre-aggregated marginals of a sweep: for every concentration column
+and every gamma column, the count, sum and sum of squares of GVR at
+each value of that column, plus a histogram of the GVR values, which
+the sweeps round to value_decimals, so medians (and any quantile) come
+out exact from integer counts. blocks are added as the sweep streams
+them, summaries from several workers merge by adding, and the whole
+thing is saved as a small .npz sidecar next to the results, so the
+marginal graph scripts never have to load the raw sweep"""
+
+MARGINAL_SUFFIX = '.marginals.npz'
+
+#sidecar file of a results file, e.g. split_fast_gvr_with_gamma.marginals.npz
+def marginal_summary_path(results_path):
+    return os.path.splitext(results_path)[0] + MARGINAL_SUFFIX
+
+#(keys, codes, counts) -> the same triple with each (key, code) pair once, sorted by key then code
+def _merge_counts(keys, codes, counts):
+    if len(keys) == 0:
+        return keys, codes, counts
+    order = np.lexsort((codes, keys))
+    keys, codes, counts = keys[order], codes[order], counts[order]
+    start = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]) | (codes[1:] != codes[:-1])])
+    return keys[start], codes[start], np.add.reduceat(counts, start)
+
+#value at (0-based) rank r of sorted codes with counts, for each r
+def _code_at_rank(codes, cum_counts, ranks):
+    return codes[np.searchsorted(cum_counts, ranks, side='right')]
+
+"""count, sum, sum of squares and value histogram of one value per
+group key; keys can be floats (a concentration or gamma column) or
+integers (e.g. packed gamma tuples, see Chunked_Groupby). with
+sketch_k set, quantiles come from a KLL sketch (Quantile_Sketch)
+instead of the histogram: O(sketch_k) memory per group whatever the
+number of distinct values, at about 1.7 / sketch_k rank error"""
+
+class GroupedValues:
+    def __init__(self, value_decimals=3, key_dtype=float, sketch_k=None, seed=None):
+        self.value_decimals = value_decimals
+        self.sketch_k = sketch_k
+        self.sketch = QuantileSketch(sketch_k, seed, key_dtype) if sketch_k else None
+        self.scale = 10 ** value_decimals
+        #sorted keys with their (count, sum, sum of squares) rows
+        self.keys = np.empty(0, dtype=key_dtype)
+        self.stats = np.empty((0, 3))
+        #compacted (key, value code, count) histogram and blocks not merged into it yet
+        self._hist = (np.empty(0, dtype=key_dtype), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self._pending = []
+        self._n_pending = 0
+
+    def _add_stats(self, keys, stats):
+        unique, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        stats = np.concatenate([self.stats, stats])
+        self.stats = np.column_stack([np.bincount(inverse, weights=stats[:, j], minlength=len(unique))
+                                      for j in range(3)]).reshape(-1, 3)
+        self.keys = unique
+
+    def _add_hist(self, keys, codes, counts):
+        self._pending.append((keys, codes, counts))
+        self._n_pending += len(keys)
+        #compacting only once the pending rows outgrow the histogram keeps adds amortized O(block)
+        if self._n_pending > max(len(self._hist[0]), 2 ** 16):
+            self.compact()
+
+    def compact(self):
+        parts = [self._hist] + self._pending
+        self._hist = _merge_counts(*(np.concatenate([p[i] for p in parts]) for i in range(3)))
+        self._pending, self._n_pending = [], 0
+
+    #add values with their group keys (non-finite values are skipped)
+    def add(self, keys, values):
+        values = np.asarray(values, dtype=float)
+        valid = np.isfinite(values)
+        keys, values = np.asarray(keys)[valid], values[valid]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        stats = np.column_stack([np.bincount(inverse, weights=w, minlength=len(unique))
+                                 for w in (np.ones(len(values)), values, values ** 2)]).reshape(-1, 3)
+        self._add_stats(unique, stats)
+        if self.sketch is not None:
+            self.sketch.add(keys, values)
+            return self
+        codes = np.rint(values * self.scale).astype(np.int64)
+        self._add_hist(*_merge_counts(keys, codes, np.ones(len(codes), dtype=np.int64)))
+        return self
+
+    def merge(self, other):
+        self._add_stats(other.keys, other.stats)
+        if self.sketch is not None:
+            self.sketch.merge(other.sketch)
+            return self
+        other.compact()
+        self._add_hist(*other._hist)
+        return self
+
+    #quantiles of the value in every group (groups x q), interpolated between ranks like numpy/pandas
+    def quantiles(self, q):
+        if self.sketch is not None:
+            return self.sketch.quantiles(self.keys, q)
+        self.compact()
+        hist_keys, codes, counts = self._hist
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        out = np.full((len(self.keys), len(q)), np.nan)
+        bounds = np.searchsorted(hist_keys, self.keys, side='left'), np.searchsorted(hist_keys, self.keys, side='right')
+        for i, (lo, hi) in enumerate(zip(*bounds)):
+            cum = np.cumsum(counts[lo:hi])
+            if len(cum) == 0:
+                continue
+            pos = (cum[-1] - 1) * q
+            below, frac = np.floor(pos), pos - np.floor(pos)
+            a = _code_at_rank(codes[lo:hi], cum, below) / self.scale
+            b = _code_at_rank(codes[lo:hi], cum, np.minimum(below + 1, cum[-1] - 1)) / self.scale
+            out[i] = interpolate_ranks(a, b, frac)
+        return out
+
+    #count, mean, std (ddof=1, as pandas), median, sum and sum of squares per key
+    def summary(self):
+        count, total, sumsq = self.stats.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / count
+            var = np.maximum(sumsq - total * mean, 0) / (count - 1)
+        return {
+            'count': count.astype(np.int64),
+            'mean': mean,
+            'std': np.where(count > 1, np.sqrt(var), np.nan),
+            'median': self.quantiles(0.5)[:, 0],
+            'sum': total,
+            'sumsq': sumsq,
+        }
+
+    #arrays for np.savez, named keys{suffix}, stats{suffix}, hist_keys{suffix} / sketch_keys{suffix}, ...
+    def to_arrays(self, suffix=''):
+        arrays = {f'keys{suffix}': self.keys, f'stats{suffix}': self.stats}
+        if self.sketch is not None:
+            arrays.update(self.sketch.to_arrays(suffix))
+            return arrays
+        self.compact()
+        for name, arr in zip(('hist_keys', 'hist_codes', 'hist_counts'), self._hist):
+            arrays[f'{name}{suffix}'] = arr
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, value_decimals=3, suffix='', sketch_k=None, seed=None):
+        groups = cls(value_decimals, arrays[f'keys{suffix}'].dtype)
+        groups.keys, groups.stats = arrays[f'keys{suffix}'], arrays[f'stats{suffix}']
+        if sketch_k:
+            groups.sketch_k = sketch_k
+            groups.sketch = QuantileSketch.from_arrays(arrays, sketch_k, seed, suffix)
+        else:
+            groups._hist = tuple(arrays[f'{name}{suffix}'] for name in ('hist_keys', 'hist_codes', 'hist_counts'))
+        return groups
+
+class MarginalSummary:
+    def __init__(self, axes, value='GVR', value_decimals=3, sketch_k=None, seed=None):
+        self.axes = list(axes)
+        self.value = value
+        self.value_decimals = value_decimals
+        self.sketch_k = sketch_k
+        seeds = np.random.SeedSequence(seed).spawn(len(self.axes))
+        self.groups = {axis: GroupedValues(value_decimals, float, sketch_k, s) for axis, s in zip(self.axes, seeds)}
+
+    #add a block of long-format rows (rows without a value are skipped, like dropna in the graphs)
+    def update(self, df):
+        values = df[self.value].to_numpy(dtype=float)
+        for axis in self.axes:
+            self.groups[axis].add(np.round(df[axis].to_numpy(dtype=float), 6), values)
+        return self
+
+    #fold another summary of the same axes into this one
+    def merge(self, other):
+        for axis in self.axes:
+            self.groups[axis].merge(other.groups[axis])
+        return self
+
+    def quantiles(self, axis, q):
+        return self.groups[axis].quantiles(q)
+
+    #one row per value of axis with count, mean, std, median, sum and sum of squares
+    def frame(self, axis):
+        return pd.DataFrame({axis: self.groups[axis].keys, **self.groups[axis].summary()})
+
+    def save(self, path):
+        metadata = {'axes': self.axes, 'value': self.value, 'value_decimals': self.value_decimals,
+                    'sketch_k': self.sketch_k}
+        arrays = {}
+        for i, axis in enumerate(self.axes):
+            arrays.update(self.groups[axis].to_arrays(suffix=f'_{i}'))
+        np.savez_compressed(path, __metadata__=np.array(json.dumps(metadata)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as store:
+            metadata = json.loads(str(store['__metadata__']))
+            summary = cls(metadata['axes'], metadata['value'], metadata['value_decimals'], metadata.get('sketch_k'))
+            for i, axis in enumerate(summary.axes):
+                summary.groups[axis] = GroupedValues.from_arrays(store, summary.value_decimals, f'_{i}',
+                                                                 summary.sketch_k)
+        return summary
+
+#summarize a whole result table and write its sidecar next to results_path
+def write_marginal_summary(df, results_path, axes, value='GVR', value_decimals=3, sketch_k=None):
+    summary = MarginalSummary(axes, value, value_decimals, sketch_k).update(df)
+    summary.save(marginal_summary_path(results_path))
+    return summary
+
+#one summary from the sidecars of several shards of a sweep (same axes), without their rows
+def merge_marginal_summaries(paths):
+    summaries = [MarginalSummary.load(path) for path in paths]
+    for other in summaries[1:]:
+        summaries[0].merge(other)
+    return summaries[0]
+
+"""what the marginal graph scripts read: the sidecar when there is one
+that is not older than the results (or the results are gone), otherwise
+the results themselves, summarized the same way"""
+
+def load_marginal(results_path, axis, value='GVR'):
+    path = marginal_summary_path(results_path)
+    if os.path.exists(path) and (not os.path.exists(results_path)
+                                 or os.path.getmtime(path) >= os.path.getmtime(results_path)):
+        summary = MarginalSummary.load(path)
+        if axis in summary.axes and summary.value == value:
+            return summary.frame(axis)
+    return MarginalSummary([axis], value).update(load_gvr_table(results_path)).frame(axis)
@@ -0,0 +1,171 @@
+import itertools
+import numpy as np
+from math import factorial
+from Simplex_Lattice import simplex_counts, simplex_lattice
+from Ring_Symmetry import multiset_permutations, arrangement_orbits
+from GVR_Polynomial import GVRPolynomial
+from Table_Cache import cached_tables
+from GVR_Store import long_format
+
+"""generic ring-oligomer engine: ring size N and any list of species
+(e.g. WT/HALO/FAST or WT/HALO/NFAST/CFAST), with a weight function that
+turns one arrangement into its contribution to each gamma. compositions
+come from the simplex lattice, arrangements are enumerated without
+duplicates and, for weights that only depend on ring distances, reduced
+to D_N orbits, so the weight is evaluated once per orbit. the result is
+the same (compositions, coefficients, table) triple as the pentamer
+models, so signals, GVR matrices and polynomials work the same way"""
+
+#shortest distance between positions i and j on an n-membered ring
+def ring_distance(i, j, n):
+    d = abs(i - j) % n
+    return min(d, n - d)
+
+"""weight functions: called with one arrangement (a tuple of species
+names), return a vector with one entry per gamma. symmetric tells the
+engine whether the weight is invariant under rotating/reflecting the
+ring; composition-only weights ignore the order entirely. cache_params
+describes the weight for the on-disk table cache (bump the version when
+a weight's definition changes)"""
+
+OLIGOMER_TABLE_VERSION = 1
+
+#(source, target) pairs at ring distance 1, 2, ... max_distance (default: every distance up to N // 2)
+def distance_weight(source='HALO', target='FAST', max_distance=None):
+    def weight(arrangement):
+        n = len(arrangement)
+        n_bins = max_distance or n // 2
+        counts = np.zeros(n_bins)
+        for i, a in enumerate(arrangement):
+            if a != source:
+                continue
+            for j, b in enumerate(arrangement):
+                if b != target or i == j:
+                    continue
+                d = ring_distance(i, j, n)
+                if d <= n_bins:
+                    counts[d - 1] += 1
+        return counts
+    weight.symmetric = True
+    weight.cache_params = {'weight': 'distance', 'source': source, 'target': target, 'max_distance': max_distance}
+    return weight
+
+#(fast pair, halo) hits per distance bin, as compute_bin_counts in Splitfast_Distance_GVR but for any ring size:
+#the pair midpoint sits at (i + j) / 2 on the unit circle and bins are split at thresholds
+def midpoint_bin_weight(thresholds=(1.0, 1.3, 1.5), halo='HALO', pair=('NFAST', 'CFAST')):
+    thresholds = np.asarray(thresholds, dtype=float)
+    def weight(arrangement):
+        n = len(arrangement)
+        counts = np.zeros(len(thresholds) + 1)
+        halo_idx = [i for i, x in enumerate(arrangement) if x == halo]
+        first = [i for i, x in enumerate(arrangement) if x == pair[0]]
+        second = [i for i, x in enumerate(arrangement) if x == pair[1]]
+        if not halo_idx or not first or not second:
+            return counts
+        short_list, long_list = (second, first) if len(first) > len(second) else (first, second)
+        halo_angles = 2 * np.pi * np.array(halo_idx) / n
+        halo_pos = np.column_stack([np.cos(halo_angles), np.sin(halo_angles)])
+        n_pairings = 0
+        for subset in itertools.permutations(long_list, len(short_list)):
+            for a, b in zip(short_list, subset):
+                mid_angle = 2 * np.pi * ((a + b) / 2 % n) / n
+                dist = np.linalg.norm(halo_pos - [np.cos(mid_angle), np.sin(mid_angle)], axis=1)
+                np.add.at(counts, np.searchsorted(thresholds, dist, side='right'), 1)
+            n_pairings += 1
+        return counts / n_pairings
+    #linear-index midpoints do not commute with rotations, so every arrangement is enumerated
+    weight.symmetric = False
+    weight.cache_params = {'weight': 'midpoint_bin', 'thresholds': thresholds.tolist(), 'halo': halo, 'pair': list(pair)}
+    return weight
+
+#weight that only depends on the species counts, e.g. count_weight(lambda c: c['HALO'] * c['FAST'])
+def count_weight(func):
+    def weight(arrangement):
+        counts = {}
+        for x in arrangement:
+            counts[x] = counts.get(x, 0) + 1
+        return np.atleast_1d(np.asarray(func(counts), dtype=float))
+    weight.symmetric = True
+    weight.composition_only = True
+    return weight
+
+class OligomerModel:
+    def __init__(self, ring_size, species, weight, gamma_columns=None, halo='HALO', conc_columns=None, cache=True):
+        self.ring_size = ring_size
+        self.species = list(species)
+        self.weight = weight
+        self.halo_index = self.species.index(halo)
+        self.conc_columns = list(conc_columns) if conc_columns else [f'[{s}]' for s in self.species]
+        self._gamma_columns = gamma_columns
+        self._tables = None
+        self.n_evaluations = 0
+        #count weights hold arbitrary callables, so only weights with cache_params go to disk
+        self.cache = cache and hasattr(weight, 'cache_params')
+
+    @property
+    def compositions(self):
+        return simplex_counts(len(self.species), self.ring_size)
+
+    #number of distinct arrangements of every composition on the ring
+    def multinomial_coeffs(self):
+        n = factorial(self.ring_size)
+        return np.array([n / np.prod([factorial(int(c)) for c in comp]) for comp in self.compositions])
+
+    #arrangements the weight is evaluated on, with multiplicities
+    def arrangements(self, composition):
+        items = [s for s, c in zip(self.species, composition) for _ in range(int(c))]
+        if getattr(self.weight, 'composition_only', False):
+            return [(tuple(items), 1)]
+        if getattr(self.weight, 'symmetric', False):
+            return arrangement_orbits(items)
+        return [(a, 1) for a in multiset_permutations(items)]
+
+    #average weight over all arrangements of one composition
+    def average_weight(self, composition):
+        arrangements = self.arrangements(composition)
+        total = sum(m for _, m in arrangements)
+        self.n_evaluations += len(arrangements)
+        return sum(m * np.asarray(self.weight(a), dtype=float) for a, m in arrangements) / total
+
+    def build_tables(self):
+        comp_array = self.compositions
+        table = np.array([self.average_weight(comp) for comp in comp_array])
+        return comp_array, self.multinomial_coeffs(), table
+
+    #(compositions, multinomial coefficients, average weight table), built once and kept in the table cache
+    def tables(self):
+        if self._tables is None:
+            if self.cache:
+                params = {'version': OLIGOMER_TABLE_VERSION, 'ring_size': self.ring_size,
+                          'species': self.species, **self.weight.cache_params}
+                self._tables = cached_tables('oligomer', params, self.build_tables)
+            else:
+                self._tables = self.build_tables()
+        return self._tables
+
+    @property
+    def gamma_columns(self):
+        if self._gamma_columns is None:
+            n_gammas = self.tables()[2].shape[1]
+            return ['Gamma'] if n_gammas == 1 else [f'Gamma{i + 1}' for i in range(n_gammas)]
+        return list(self._gamma_columns)
+
+    #closed-form polynomial of the model (see GVR_Polynomial)
+    def polynomial(self):
+        comp_array, coeffs, table = self.tables()
+        return GVRPolynomial(comp_array, coeffs[:, None] * table, self.gamma_columns, self.halo_index)
+
+    #per-gamma signals divided by [HALO]: (points x gammas), NaN where [HALO] is 0
+    def signals(self, concentrations, chunk_size=65536):
+        return self.polynomial().signals(concentrations, chunk_size)
+
+    #GVR for every point and gamma tuple: (points x gamma tuples)
+    def gvr_matrix(self, concentrations, gammas):
+        return self.signals(concentrations) @ np.atleast_2d(np.asarray(gammas, dtype=float)).T
+
+    #long-format sweep over the concentration lattice (point outer, gamma tuple inner)
+    def sweep(self, step, gammas):
+        conc = simplex_lattice(len(self.species), step)
+        gammas = np.atleast_2d(np.asarray(gammas, dtype=float))
+        gvr = self.gvr_matrix(conc, gammas)
+        return long_format(conc, self.conc_columns, gammas, self.gamma_columns, {'GVR': gvr}).round(3)
@@ -0,0 +1,19 @@
+from Oligomer_Engine import OligomerModel, distance_weight
+from GVR_Store import save_gvr_table
+
+#distance-dependent WT/HALO/FAST model on larger rings; one gamma per ring distance (1 .. N // 2)
+step = 0.05
+species = ['WT', 'HALO', 'FAST']
+conc_columns = ['[NPM1]_WT', '[NPM1]_Halo', '[NPM1]_FAST']
+
+#gamma decays with distance, scaled from gamma1
+gamma1_values = [0.25, 0.5, 1, 2, 4]
+decay = 0.5
+
+for ring_size, name in [(6, 'hexamer'), (7, 'heptamer')]:
+    model = OligomerModel(ring_size, species, distance_weight('HALO', 'FAST'), conc_columns=conc_columns)
+    n_gammas = len(model.gamma_columns)
+    gammas = [[g1 * decay ** d for d in range(n_gammas)] for g1 in gamma1_values]
+    df = model.sweep(step, gammas)
+    print(name, len(df), 'rows')
+    save_gvr_table(df, f"npm1_gvr_distance_{name}_output.csv", model=f'distance_{name}')
@@ -0,0 +1,157 @@
+import numpy as np
+
+"""mergeable KLL quantile sketch for many groups at once: every group
+has a stack of compactors, level h holding items of weight 2^h. when a
+group's level h outgrows its capacity (k at the top level, shrinking by
+2/3 per level below it, at least 2) its items are sorted and every
+other one, from a random start, moves up a level with double weight,
+so a group keeps O(k) items however many values it sees, and ranks
+are off by about 1.7 / k of the group's count (k = 200 -> ~1%).
+the count of each group stays exact, groups that never fill a level
+give exact quantiles, and two sketches merge by stacking their levels
+and compacting again, so worker or shard sketches combine in the
+parent without the raw values. all levels are flat (key, value)
+arrays, so adding a block of values for thousands of groups is a few
+sorts, not a loop over groups. sketches pickle, so they can be
+returned from Pool workers"""
+
+SKETCH_DECAY = 2 / 3
+
+#value at (fractional) position pos between sorted neighbours a and b, with the
+#same float arithmetic as np.quantile, and np.median/pandas for the middle of an even count
+def interpolate_ranks(a, b, frac):
+    return np.where(frac == 0.5, (a + b) / 2, np.where(frac < 0.5, a + (b - a) * frac, b - (b - a) * (1 - frac)))
+
+class QuantileSketch:
+    def __init__(self, k=200, seed=None, key_dtype=np.int64):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.key_dtype = key_dtype
+        #levels[h] = (keys, values) of the items with weight 2^h
+        self.levels = []
+
+    @property
+    def n_items(self):
+        return sum(len(keys) for keys, _ in self.levels)
+
+    def _push(self, h, keys, values):
+        while len(self.levels) <= h:
+            self.levels.append((np.empty(0, dtype=self.key_dtype), np.empty(0)))
+        self.levels[h] = (np.concatenate([self.levels[h][0], keys]), np.concatenate([self.levels[h][1], values]))
+
+    #number of levels of each of the given (sorted, unique) keys
+    def _heights(self, keys, h):
+        heights = np.full(len(keys), h + 1)
+        for level in range(len(self.levels) - 1, h, -1):
+            present = np.isin(keys, self.levels[level][0]) & (heights == h + 1)
+            heights[present] = level + 1
+        return heights
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            keys, values = self.levels[h]
+            if len(keys) == 0:
+                h += 1
+                continue
+            #sort by key then value: values first, then a stable sort on the keys
+            order = np.argsort(values)
+            order = order[np.argsort(keys[order], kind='stable')]
+            keys, values = keys[order], values[order]
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            counts = np.diff(np.r_[starts, len(keys)])
+            capacity = np.maximum(2, np.floor(self.k * SKETCH_DECAY ** (self._heights(keys[starts], h) - 1 - h)))
+            over = counts > capacity
+            if not over.any():
+                h += 1
+                continue
+            sel = np.repeat(over, counts)
+            stay_keys, stay_values = keys[~sel], values[~sel]
+            keys, values = keys[sel], values[sel]
+            #position of every item within its group, and the group's even number of items to compact
+            n_group = counts[over]
+            start = np.repeat(np.cumsum(n_group) - n_group, n_group)
+            pos = np.arange(len(keys)) - start
+            n_even = np.repeat(n_group - n_group % 2, n_group)
+            offset = np.repeat(self.rng.integers(0, 2, len(n_group)), n_group)
+            compacted = pos < n_even
+            promote = compacted & (pos % 2 == offset)
+            #an odd item out stays where it is
+            self.levels[h] = (np.concatenate([stay_keys, keys[~compacted]]),
+                              np.concatenate([stay_values, values[~compacted]]))
+            self._push(h + 1, keys[promote], values[promote])
+            h += 1
+
+    #add values with their group keys (non-finite values are skipped)
+    def add(self, keys, values):
+        values = np.asarray(values, dtype=float)
+        valid = np.isfinite(values)
+        self._push(0, np.asarray(keys, dtype=self.key_dtype)[valid], values[valid])
+        self._compress()
+        return self
+
+    #fold another sketch into this one
+    def merge(self, other):
+        for h, (keys, values) in enumerate(other.levels):
+            self._push(h, keys, values)
+        self._compress()
+        return self
+
+    #all items with their weights, sorted by key then value
+    def _items(self):
+        if not self.levels:
+            return np.empty(0, dtype=self.key_dtype), np.empty(0), np.empty(0, dtype=np.int64)
+        keys = np.concatenate([k for k, _ in self.levels])
+        values = np.concatenate([v for _, v in self.levels])
+        weights = np.concatenate([np.full(len(k), 2 ** h, dtype=np.int64) for h, (k, _) in enumerate(self.levels)])
+        order = np.lexsort((values, keys))
+        return keys[order], values[order], weights[order]
+
+    #(exact) number of values seen for each key
+    def counts(self, keys):
+        item_keys, _, weights = self._items()
+        cum = np.concatenate([[0], np.cumsum(weights)])
+        keys = np.asarray(keys, dtype=self.key_dtype)
+        return cum[np.searchsorted(item_keys, keys, side='right')] - cum[np.searchsorted(item_keys, keys, side='left')]
+
+    #quantiles of every given key (keys x q), NaN for keys without values
+    def quantiles(self, keys, q):
+        item_keys, values, weights = self._items()
+        keys = np.asarray(keys, dtype=self.key_dtype)
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        cum = np.cumsum(weights)
+        lo = np.searchsorted(item_keys, keys, side='left')
+        hi = np.searchsorted(item_keys, keys, side='right')
+        base = np.where(lo > 0, cum[np.maximum(lo - 1, 0)], 0)
+        n = np.where(hi > lo, cum[np.maximum(hi - 1, 0)] - base, 0)
+        out = np.full((len(keys), len(q)), np.nan)
+        has = n > 0
+        if not has.any() or len(values) == 0:
+            return out
+        #ranks as in np.quantile, each weight-w item standing for w equal values
+        pos = (n[has, None] - 1) * q[None, :]
+        below = np.floor(pos)
+        above = np.minimum(below + 1, n[has, None] - 1)
+        a = values[np.searchsorted(cum, base[has, None] + below, side='right')]
+        b = values[np.searchsorted(cum, base[has, None] + above, side='right')]
+        out[has] = interpolate_ranks(a, b, pos - below)
+        return out
+
+    #flat arrays for np.savez: item keys, values and levels
+    def to_arrays(self, suffix=''):
+        keys = [k for k, _ in self.levels]
+        return {
+            f'sketch_keys{suffix}': np.concatenate(keys) if keys else np.empty(0, dtype=self.key_dtype),
+            f'sketch_values{suffix}': np.concatenate([v for _, v in self.levels]) if keys else np.empty(0),
+            f'sketch_levels{suffix}': np.concatenate([np.full(len(k), h, dtype=np.int8) for h, k in enumerate(keys)])
+            if keys else np.empty(0, dtype=np.int8),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, k=200, seed=None, suffix=''):
+        keys, values = arrays[f'sketch_keys{suffix}'], arrays[f'sketch_values{suffix}']
+        levels = arrays[f'sketch_levels{suffix}']
+        sketch = cls(k, seed, keys.dtype)
+        for h in range(int(levels.max()) + 1 if len(levels) else 0):
+            sketch._push(h, keys[levels == h], values[levels == h])
+        return sketch
@@ -0,0 +1,83 @@
+import numpy as np
+
+"""arrangements of subunits on an n-membered ring up to symmetry: the
+rotations (and reflections) of the ring form the dihedral group D_n, and
+any quantity that depends only on ring distances (e.g. circular_distance
+between HALO and FAST) is the same for every arrangement in an orbit.
+each orbit is kept as its lexicographically smallest arrangement plus
+the number of distinct arrangements it stands for, so averages over all
+arrangements become multiplicity-weighted sums over far fewer terms"""
+
+#distinct orderings of a multiset in lexicographic order, without generating n! duplicates
+def multiset_permutations(items):
+    a = sorted(items)
+    n = len(a)
+    while True:
+        yield tuple(a)
+        #next permutation: rightmost ascent, swap with the smallest larger item after it, reverse the tail
+        i = n - 2
+        while i >= 0 and a[i] >= a[i + 1]:
+            i -= 1
+        if i < 0:
+            return
+        j = n - 1
+        while a[j] <= a[i]:
+            j -= 1
+        a[i], a[j] = a[j], a[i]
+        a[i + 1:] = reversed(a[i + 1:])
+
+#fixed-content necklaces of the counts (symbols 0..k-1) in lexicographic order, each with its period:
+#every rotation class once at its smallest rotation (Sawada's fixed-content algorithm), so the cost
+#follows the number of necklaces, not the number of arrangements
+def fixed_content_necklaces(counts):
+    n = sum(counts)
+    remaining = list(counts)
+    first = next(j for j, c in enumerate(remaining) if c)
+    remaining[first] -= 1
+    a = [first] * n
+
+    #a[:t] is a prenecklace whose longest Lyndon prefix has length p
+    def extend(t, p):
+        if t == n:
+            if n % p == 0:
+                yield tuple(a), p
+            return
+        for j in range(a[t - p], len(remaining)):
+            if remaining[j]:
+                a[t] = j
+                remaining[j] -= 1
+                yield from extend(t + 1, p if j == a[t - p] else t + 1)
+                remaining[j] += 1
+
+    yield from extend(1, 1)
+
+#smallest rotation of an arrangement
+def least_rotation(arrangement):
+    doubled = arrangement + arrangement
+    return min(doubled[i:i + len(arrangement)] for i in range(len(arrangement)))
+
+#(representative, multiplicity) for every orbit of arrangements of items on the ring, in lexicographic order
+#(symbols are numbered in sorted order, so necklace order is arrangement order); multiplicities sum to the number of distinct arrangements.
+#a necklace of period p has p distinct rotations; with reflections its mirror image joins the orbit,
+#doubling it to 2p unless the mirror image is one of those rotations
+def arrangement_orbits(items, reflections=True):
+    symbols = sorted(set(items))
+    counts = [list(items).count(x) for x in symbols]
+    orbits = []
+    for necklace, period in fixed_content_necklaces(counts):
+        multiplicity = period
+        if reflections:
+            mirror = least_rotation(necklace[::-1])
+            #each bracelet is met once, at the smaller of its two necklaces
+            if mirror < necklace:
+                continue
+            if mirror != necklace:
+                multiplicity = 2 * period
+        orbits.append((tuple(symbols[x] for x in necklace), multiplicity))
+    return orbits
+
+#multiplicity-weighted average of func over all distinct arrangements of items
+def orbit_average(items, func, reflections=True):
+    orbits = arrangement_orbits(items, reflections)
+    total = sum(m for _, m in orbits)
+    return sum(m * np.asarray(func(rep), dtype=float) for rep, m in orbits) / total
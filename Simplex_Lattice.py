@@ -0,0 +1,71 @@
+import itertools
+import numpy as np
+from scipy.special import comb
+
+"""enumerate concentration points on the simplex directly as integer
+compositions of 1/step, instead of building the full np.arange grid
+and keeping only the points that pass np.isclose(sum, 1.0)"""
+
+#number of lattice divisions for a step size, e.g. 0.05 -> 20
+def lattice_divisions(step):
+    divisions = int(round(1.0 / step))
+    if divisions <= 0 or not np.isclose(divisions * step, 1.0):
+        raise ValueError(f"step {step} does not evenly divide 1.0")
+    return divisions
+
+#number of points on the lattice
+def lattice_size(n_species, divisions):
+    return int(comb(divisions + n_species - 1, n_species - 1, exact=True))
+
+#integer compositions of total into n_species parts, in the same order as the nested sweep loops
+def simplex_counts(n_species, total):
+    if n_species == 1:
+        return np.array([[total]])
+    #stars and bars: each choice of bar positions is one composition
+    n_slots = total + n_species - 1
+    bars = np.fromiter(
+        itertools.chain.from_iterable(itertools.combinations(range(n_slots), n_species - 1)),
+        dtype=np.int64,
+    ).reshape(-1, n_species - 1)
+    edges = np.hstack([
+        np.full((len(bars), 1), -1),
+        bars,
+        np.full((len(bars), 1), n_slots),
+    ])
+    return np.diff(edges, axis=1) - 1
+
+#concentration points (integer counts / divisions, no float drift) for a given species count and step
+def simplex_lattice(n_species, step):
+    divisions = lattice_divisions(step)
+    return simplex_counts(n_species, divisions) / divisions
+
+#exact binomial coefficients for integer arrays
+def _binom(n, k):
+    return np.rint(comb(n, k)).astype(np.int64)
+
+#position of each composition (rows of counts summing to total) in simplex_counts order
+def lattice_rank(counts, total):
+    counts = np.atleast_2d(np.asarray(counts, dtype=np.int64))
+    n_species = counts.shape[1]
+    ranks = np.zeros(len(counts), dtype=np.int64)
+    remaining = np.full(len(counts), total, dtype=np.int64)
+    for i in range(n_species - 1):
+        parts = n_species - i
+        #compositions sharing the prefix so far whose next part is smaller
+        ranks += _binom(remaining + parts - 1, parts - 1) - _binom(remaining - counts[:, i] + parts - 1, parts - 1)
+        remaining -= counts[:, i]
+    return ranks
+
+#contiguous [start, stop) range of points whose leading counts equal prefix
+def lattice_prefix_range(prefix, n_species, total):
+    prefix = [int(c) for c in prefix]
+    remaining = total - sum(prefix)
+    parts = n_species - len(prefix)
+    if remaining < 0 or parts < 0 or (parts == 0 and remaining != 0):
+        return 0, 0
+    if parts == 0:
+        start = int(lattice_rank(prefix, total)[0])
+        return start, start + 1
+    first = prefix + [0] * (parts - 1) + [remaining]
+    start = int(lattice_rank(first, total)[0])
+    return start, start + int(_binom(remaining + parts - 1, parts - 1))
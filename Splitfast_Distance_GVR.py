@@ -1,65 +1,90 @@
+import os
 import numpy as np
 import pandas as pd #^numerical tools and dataframes
 import itertools #generates unique permutations
+from collections import deque #blocks in flight
 from scipy.special import comb #combinatorics choose function
 from multiprocessing import Pool, cpu_count #allows parallelization
 from tqdm import tqdm #progress bar
+from Simplex_Lattice import simplex_lattice, lattice_size, lattice_rank #concentration points on the simplex
+from Gamma_Tuples import count_gamma_tuples, gamma_tuple_block #gamma tuples without nested loops
+from Sweep_Checkpoint import sweep_fingerprint, load_manifest, save_shard, mark_shard_complete, clear_manifest, iter_shard_frames, remove_checkpoint #resumable sweeps
+from GVR_Store import STORE_FORMATS, GVRStoreWriter, make_metadata, infer_divisions, long_format #compact binary output
+from GVR_Cube import create_gvr_cube, open_gvr_cube, sidecar_path #dense memory-mapped output
+from Table_Cache import cached_tables #bin tables persisted between runs
+from Marginal_Summary import MarginalSummary, marginal_summary_path #per-column GVR marginals for the graphs
 
 #define 2D positions on unit circle for pentamer
 angles = [2 * np.pi * i / 5 for i in range(5)]
 circle_coords = [(np.cos(a), np.sin(a)) for a in angles]
 
+#upper edges of the gamma1-gamma3 distance bins (anything further is gamma4)
+DISTANCE_THRESHOLDS = (1.0, 1.3, 1.5)
+#bump when the bin geometry changes, so cached bin tables are rebuilt
+BIN_TABLE_VERSION = 1
+
+#assign distance bin (0-3 for gamma1-gamma4) from midpoint of fast pair to halo
+def assign_bin(distance):
+    for i, threshold in enumerate(DISTANCE_THRESHOLDS):
+        if distance < threshold:
+            return i
+    return len(DISTANCE_THRESHOLDS)
+
 #assign gamma based on distance from midpoint of fast pair to halo
 def assign_gamma(distance, gamma_map):
-    if distance < 1.0:
-        return gamma_map['gamma1']
-    elif distance < 1.3:
-        return gamma_map['gamma2']
-    elif distance < 1.5:
-        return gamma_map['gamma3']
-    else:
-        return gamma_map['gamma4']
+    return gamma_map[f'gamma{assign_bin(distance) + 1}']
 
-# Compute total gamma for a given permutation
-def compute_total_gamma(pentamer, gamma_map):
+"""pentamer geometry as lookup tables: a fast pair at positions (i, j) 
+has its midpoint at (i + j) / 2 % 5, i.e. one of 10 half-step points on 
+the ring indexed by (i + j) % 10, so the distance from every halo 
+position to every midpoint, and its bin, is computed once here. 
+PAIRINGS[(k, m)] lists every way to pick an ordered k of m long-list 
+entries (the permutations(long_list, k) pairings), as index rows"""
+
+MIDPOINT_DISTANCE = np.array([
+    [np.linalg.norm(np.array(circle_coords[h]) - np.array((np.cos(2 * np.pi * (s / 2 % 5) / 5),
+                                                             np.sin(2 * np.pi * (s / 2 % 5) / 5))))
+     for s in range(10)]
+    for h in range(5)
+])
+MIDPOINT_BIN = np.array([[assign_bin(d) for d in row] for row in MIDPOINT_DISTANCE], dtype=np.int8)
+PAIRINGS = {
+    (k, m): np.array(list(itertools.permutations(range(m), k)), dtype=np.int8).reshape(-1, k)
+    for m in range(1, 6) for k in range(1, m + 1)
+}
+_MIDPOINT_BIN_ROWS = MIDPOINT_BIN.tolist()
+_PAIRING_ROWS = {key: table.tolist() for key, table in PAIRINGS.items()}
+
+#count (fast pair, halo) hits per distance bin for a given permutation
+def compute_bin_counts(pentamer):
     halo_idx = [i for i, x in enumerate(pentamer) if x == 'HALO']
     nfast_idx = [i for i, x in enumerate(pentamer) if x == 'NFAST']
     cfast_idx = [i for i, x in enumerate(pentamer) if x == 'CFAST']
 #^collects indicies of halo, nfast , and cfast, if not all are present, GVR=0
     if not halo_idx or not nfast_idx or not cfast_idx:
-        return 0
-
-    min_len = min(len(nfast_idx), len(cfast_idx))
-    if min_len == 0 or not halo_idx:
-        return 0  #no valid pairs
+        return np.zeros(len(DISTANCE_THRESHOLDS) + 1)
 
-    #determine which is longer and permute that one
+    #the longer list is permuted against the shorter one
     if len(nfast_idx) > len(cfast_idx):
-        long_list = nfast_idx
-        short_list = sorted(cfast_idx)
+        long_list, short_list = nfast_idx, cfast_idx
     else:
-        long_list = cfast_idx
-        short_list = sorted(nfast_idx)
-
-    total_gamma_across_perms = 0
-    perm_count = 0
-
-    for subset in itertools.permutations(long_list, min_len):
-        pairings = zip(sorted(short_list), subset)
-        gamma_sum = 0
-        for nf, cf in pairings:
-            midpoint_idx = (nf + cf) / 2 % 5
-            mid_angle = 2 * np.pi * midpoint_idx / 5
-            midpoint_pos = (np.cos(mid_angle), np.sin(mid_angle))
-            for h in halo_idx:
-                halo_pos = circle_coords[h]
-                dist = np.linalg.norm(np.array(halo_pos) - np.array(midpoint_pos))
-                gamma_sum += assign_gamma(dist, gamma_map)
-        total_gamma_across_perms += gamma_sum
-        perm_count += 1
-
-    avg_gamma = total_gamma_across_perms / perm_count if perm_count > 0 else 0
-    return avg_gamma
+        long_list, short_list = cfast_idx, nfast_idx
+
+    #plain list indexing: the arrays involved are far too small for numpy calls to pay off
+    pairings = _PAIRING_ROWS[(len(short_list), len(long_list))]
+    halo_bins = [_MIDPOINT_BIN_ROWS[h] for h in halo_idx]
+    counts = [0] * (len(DISTANCE_THRESHOLDS) + 1)
+    for pairing in pairings:
+        for a, j in zip(short_list, pairing):
+            midpoint = (a + long_list[j]) % 10
+            for row in halo_bins:
+                counts[row[midpoint]] += 1
+    return np.array(counts) / len(pairings)
+
+# Compute total gamma for a given permutation
+def compute_total_gamma(pentamer, gamma_map):
+    gammas = [gamma_map['gamma1'], gamma_map['gamma2'], gamma_map['gamma3'], gamma_map['gamma4']]
+    return float(np.dot(compute_bin_counts(pentamer), gammas))
 
 #generate all valid compositions of a pentamer
 def generate_compositions():
@@ -85,28 +110,43 @@ def generate_permutations(compositions):
             composition_perms[(wt, h, nf, cf)] = list(set(itertools.permutations(tags)))
     return composition_perms
 
+"""reduce each composition to its multinomial coefficient and the 
+average distance-bin hits over its permutations; the geometry never 
+changes, so GVR for any gamma tuple is a dot product against these"""
+
+def generate_bin_tables(composition_perms):
+    comp_keys = list(composition_perms)
+    comp_array = np.array(comp_keys)
+    wt_n, h_n, nf_n = comp_array[:, 0], comp_array[:, 1], comp_array[:, 2]
+    coeffs = comb(5, wt_n) * comb(5 - wt_n, h_n) * comb(5 - wt_n - h_n, nf_n)
+    bin_table = np.array([
+        np.mean([compute_bin_counts(p) for p in composition_perms[key]], axis=0)
+        for key in comp_keys
+    ])
+    return comp_array, coeffs, bin_table
+
+#bin tables from the on-disk cache, built on the first run for these parameters
+def load_bin_tables(cache_dir=None):
+    params = {
+        'version': BIN_TABLE_VERSION, 'ring_size': 5, 'species': ['WT', 'HALO', 'NFAST', 'CFAST'],
+        'thresholds': list(DISTANCE_THRESHOLDS),
+    }
+    return cached_tables('split_fast_distance_bins', params,
+                         lambda: generate_bin_tables(generate_permutations(generate_compositions())), cache_dir)
+
 #function for a single gamma/concentration combination
 def compute_gvr(args):
-    wt, h, nf, cf, gamma1, gamma2, gamma3, gamma4, composition_perms = args
-    gamma_map = {'gamma1': gamma1, 'gamma2': gamma2, 'gamma3': gamma3, 'gamma4': gamma4}
-    total_signal = 0
-
-    for (wt_n, h_n, nf_n, cf_n), perms in composition_perms.items():
-        if not perms:
-            continue
-        prob = (
-            comb(5, wt_n)
-            * comb(5 - wt_n, h_n)
-            * comb(5 - wt_n - h_n, nf_n)
-            * (wt ** wt_n)
-            * (h ** h_n)
-            * (nf ** nf_n)
-            * (cf ** cf_n)
-        )
+    wt, h, nf, cf, gamma1, gamma2, gamma3, gamma4, bin_tables = args
+    comp_array, coeffs, bin_table = bin_tables
 
-        gamma_sum = sum(compute_total_gamma(p, gamma_map) for p in perms)
-        avg_gamma = gamma_sum / len(perms)
-        total_signal += prob * avg_gamma
+    probs = (
+        coeffs
+        * (wt ** comp_array[:, 0])
+        * (h ** comp_array[:, 1])
+        * (nf ** comp_array[:, 2])
+        * (cf ** comp_array[:, 3])
+    )
+    total_signal = probs @ (bin_table @ np.array([gamma1, gamma2, gamma3, gamma4]))
 
     gvr = total_signal / h if h > 0 else np.nan
     return {
@@ -115,30 +155,269 @@ def compute_gvr(args):
         'GVR': round(gvr, 3)
     }
 
+"""batched evaluator: per-bin signals for an (N x 4) array of 
+concentrations, then the full (N x M) GVR matrix for an (M x 4) array 
+of gamma tuples as one matrix product, optionally chunk_size gamma 
+tuples at a time so large gamma grids stay memory bounded"""
+
+def compute_bin_signals(concentrations, bin_tables):
+    comp_array, coeffs, bin_table = bin_tables
+    conc = np.atleast_2d(np.asarray(concentrations, dtype=float))
+    probs = coeffs * np.prod(conc[:, None, :] ** comp_array[None, :, :], axis=2)
+    signals = probs @ bin_table
+    halo = conc[:, 1:2]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(halo > 0, signals / halo, np.nan)
+
+def iter_gvr_blocks(concentrations, gammas, bin_tables, chunk_size=None):
+    signals = compute_bin_signals(concentrations, bin_tables)
+    gammas = np.atleast_2d(np.asarray(gammas, dtype=float))
+    chunk_size = chunk_size or max(len(gammas), 1)
+    for start in range(0, len(gammas), chunk_size):
+        yield start, signals @ gammas[start:start + chunk_size].T
+
+def compute_gvr_matrix(concentrations, gammas, bin_tables, chunk_size=None, out=None):
+    n_conc = len(np.atleast_2d(concentrations))
+    n_gamma = len(np.atleast_2d(gammas))
+    if out is None:
+        out = np.empty((n_conc, n_gamma))
+    for start, block in iter_gvr_blocks(concentrations, gammas, bin_tables, chunk_size):
+        out[:, start:start + block.shape[1]] = block
+    return out
+
+"""sweep driver: each worker process receives the concentration 
+points and bin tables once through the pool initializer, and tasks 
+are just (conc_start, conc_stop, gamma_start, gamma_stop) index 
+ranges, with gamma tuples regenerated from their ranks in the worker"""
+
+_worker_state = {}
+
+def init_worker(concentrations, gamma_vals, ordered, bin_tables):
+    _worker_state['concentrations'] = concentrations
+    _worker_state['gamma_vals'] = gamma_vals
+    _worker_state['ordered'] = ordered
+    _worker_state['bin_tables'] = bin_tables
+
+#GVR for one block of the sweep
+def compute_gvr_block(task):
+    conc_start, conc_stop, gamma_start, gamma_stop = task
+    conc = _worker_state['concentrations'][conc_start:conc_stop]
+    gammas = gamma_tuple_block(_worker_state['gamma_vals'], gamma_start, gamma_stop, ordered=_worker_state['ordered'])
+    return task, compute_gvr_matrix(conc, gammas, _worker_state['bin_tables'])
+
+#index-range tasks covering the whole concentration x gamma grid, generated lazily
+def generate_block_tasks(n_conc, n_gamma, conc_block=64, gamma_block=1024):
+    for c in range(0, n_conc, conc_block):
+        for g in range(0, n_gamma, gamma_block):
+            yield c, min(c + conc_block, n_conc), g, min(g + gamma_block, n_gamma)
+
+#number of tasks generate_block_tasks will yield
+def count_block_tasks(n_conc, n_gamma, conc_block=64, gamma_block=1024):
+    return -(-n_conc // conc_block) * -(-n_gamma // gamma_block)
+
+#position of a task in generate_block_tasks order (its shard id when checkpointing)
+def block_task_id(task, n_gamma, conc_block=64, gamma_block=1024):
+    conc_start, _, gamma_start, _ = task
+    return (conc_start // conc_block) * -(-n_gamma // gamma_block) + gamma_start // gamma_block
+
+#long-format rows (concentration outer, gamma inner) for a block of GVR values
+def gvr_block_frame(concentrations, gammas, gvr):
+    return long_format(concentrations, ['[WT]', '[HALO]', '[NFAST]', '[CFAST]'],
+                       gammas, ['Gamma1', 'Gamma2', 'Gamma3', 'Gamma4'], {'GVR': gvr})
+
+#fn over tasks in task order through pool, with at most max_in_flight tasks submitted at a time:
+#tasks are only taken from the (lazy) generator as results are handed out, so neither the task list
+#nor finished blocks waiting for the writer ever pile up in the parent
+def bounded_imap(pool, fn, tasks, max_in_flight):
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(fn, (task,)))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+#True if path holds a cube (with its sidecar) whose metadata has all the expected values
+def cube_matches(path, expected):
+    if not (os.path.exists(path) and os.path.exists(sidecar_path(path))):
+        return False
+    metadata = open_gvr_cube(path).metadata
+    return all(metadata.get(key) == value for key, value in expected.items())
+
+#one concentration block's gamma-block frames (in gamma order) as a single frame in row order:
+#each concentration followed by all of its gamma tuples
+def concentration_major(frames, n_conc):
+    offsets = np.cumsum([0] + [len(f) for f in frames])
+    order = np.hstack([np.arange(start, stop).reshape(n_conc, -1) for start, stop in zip(offsets[:-1], offsets[1:])])
+    return pd.concat(frames, ignore_index=True).iloc[order.ravel()].reset_index(drop=True)
+
+#finished shards of a checkpointed sweep, one concentration block at a time in row order
+def iter_sweep_frames(checkpoint_dir, n_conc, n_gamma, conc_block, gamma_block, columns):
+    n_tasks = count_block_tasks(n_conc, n_gamma, conc_block, gamma_block)
+    per_block = -(-n_gamma // gamma_block)
+    frames = []
+    for df in iter_shard_frames(checkpoint_dir, n_tasks, columns):
+        frames.append(df)
+        if len(frames) == per_block:
+            yield concentration_major(frames, len(frames[0]) // min(gamma_block, n_gamma))
+            frames = []
+
+"""run a full sweep over concentrations x gamma tuples, streaming it 
+to CSV: tasks are generated lazily and blocks come back in task order
+through bounded_imap, at most max_in_flight (default two per core) at
+a time; once all gamma blocks of a concentration block are in, they
+are joined and appended to the file, so rows come out as in the
+original sweep (each concentration followed by all of its gamma
+tuples). peak memory in the parent is max_in_flight blocks plus one
+concentration block across the gamma axis, whatever the sweep size.
+
+with checkpoint_dir set, every block is a shard saved on its own and 
+recorded in a manifest; rerunning the same sweep skips finished shards 
+and the final merge writes the rows in the same order.
+
+an output_path ending in .npz or .parquet writes the compact binary 
+store from GVR_Store instead of CSV, and one ending in .npy writes 
+blocks straight into a dense GVR_Cube (concentrations must then be the 
+full simplex_lattice, in order).
+
+with marginals set, count/sum/sum of squares and a GVR histogram per
+concentration and gamma column are kept as blocks arrive and saved to
+the .marginals.npz sidecar (see Marginal_Summary; marginal_sketch_k
+keeps KLL sketches instead of exact histograms); a checkpointed run
+builds them from the finished shards at the end instead, since a
+resumed run never sees the blocks of the earlier runs"""
+
+def run_sweep(concentrations, gamma_vals, ordered, output_path,
+              conc_block=64, gamma_block=1024, max_in_flight=None, checkpoint_dir=None, marginals=True,
+              marginal_sketch_k=None):
+    bin_tables = load_bin_tables()
+
+    n_values = len(np.unique(gamma_vals)) if ordered else len(gamma_vals)
+    n_gamma = count_gamma_tuples(n_values, ordered=ordered)
+    tasks = generate_block_tasks(len(concentrations), n_gamma, conc_block, gamma_block)
+    n_tasks = count_block_tasks(len(concentrations), n_gamma, conc_block, gamma_block)
+
+    print(f"Total points: {len(concentrations) * n_gamma} in {n_tasks} tasks — running on {cpu_count()} cores...")
+
+    ext = os.path.splitext(output_path)[1].lower()
+    empty = gvr_block_frame(concentrations[:0], np.empty((0, 4)), np.empty((0, 0)))
+    header = empty.to_csv(index=False)
+    divisions = infer_divisions(concentrations)
+    metadata = None
+    if ext in STORE_FORMATS:
+        metadata = make_metadata(empty.columns, model='split_fast_distance',
+                                 conc_divisions=divisions, gamma_values=gamma_vals)
+    cube_metadata = None
+    if ext == '.npy':
+        cube_metadata = {
+            'model': 'split_fast_distance', 'conc_columns': list(empty.columns[:4]), 'conc_divisions': divisions,
+            'gamma_columns': list(empty.columns[4:8]), 'gamma_values': [float(g) for g in gamma_vals],
+            'gamma_axis': 'ordered' if ordered else 'product',
+        }
+        if divisions is None or len(concentrations) != lattice_size(4, divisions) or np.any(
+                lattice_rank(np.rint(concentrations * divisions), divisions) != np.arange(len(concentrations))):
+            raise ValueError("a .npy cube needs the full simplex_lattice of concentrations, in order")
+
+    completed = set()
+    if checkpoint_dir is not None:
+        fingerprint = sweep_fingerprint(
+            concentrations, np.asarray(gamma_vals),
+            ordered=ordered, conc_block=conc_block, gamma_block=gamma_block, output_format=ext
+        )
+        completed = load_manifest(checkpoint_dir, fingerprint, n_tasks, shard_files=ext != '.npy')
+        #shards of a cube sweep live in the cube itself, so they are only done if that cube is still there
+        if ext == '.npy' and completed and not cube_matches(output_path, cube_metadata):
+            print(f"{output_path} is missing or belongs to another sweep, recomputing every shard")
+            clear_manifest(checkpoint_dir, completed)
+        tasks = (t for t in tasks if block_task_id(t, n_gamma, conc_block, gamma_block) not in completed)
+        if completed:
+            print(f"Resuming: {len(completed)} of {n_tasks} shards already done")
+
+    store = None
+    cube = None
+    summary = MarginalSummary(empty.columns[:8], sketch_k=marginal_sketch_k, seed=0) if marginals else None
+    if ext == '.npy':
+        if completed and os.path.exists(output_path):
+            cube = open_gvr_cube(output_path, mode='r+')
+        else:
+            cube = create_gvr_cube(output_path, cube_metadata['model'], cube_metadata['conc_columns'], divisions,
+                                   cube_metadata['gamma_columns'], gamma_vals, cube_metadata['gamma_axis'])
+    elif checkpoint_dir is None:
+        if metadata is not None:
+            store = GVRStoreWriter(output_path, metadata)
+        else:
+            #header only, then append blocks
+            with open(output_path, 'w') as f:
+                f.write(header)
+
+    #gamma blocks (gammas, GVR) of the concentration block being collected
+    row_gammas, row_blocks = [], []
+    with Pool(cpu_count(), initializer=init_worker,
+              initargs=(concentrations, gamma_vals, ordered, bin_tables)) as pool:
+        results = bounded_imap(pool, compute_gvr_block, tasks, max_in_flight or 2 * cpu_count())
+        for task, block in tqdm(results, total=n_tasks - len(completed)):
+            c0, c1, g0, g1 = task
+            shard_id = block_task_id(task, n_gamma, conc_block, gamma_block)
+            gammas = gamma_tuple_block(gamma_vals, g0, g1, ordered=ordered)
+            if cube is not None:
+                cube.values[c0:c1, g0:g1] = block.round(3)
+                if checkpoint_dir is not None:
+                    cube.values.flush()
+                    mark_shard_complete(checkpoint_dir, shard_id, completed)
+                elif summary is not None:
+                    summary.update(gvr_block_frame(concentrations[c0:c1], gammas, block).round(3))
+                continue
+
+            if checkpoint_dir is not None:
+                save_shard(checkpoint_dir, shard_id, gvr_block_frame(concentrations[c0:c1], gammas, block).round(3),
+                           completed)
+                continue
+            row_gammas.append(gammas)
+            row_blocks.append(block)
+            if g1 < n_gamma:
+                continue
+            df = gvr_block_frame(concentrations[c0:c1], np.vstack(row_gammas), np.hstack(row_blocks)).round(3)
+            row_gammas, row_blocks = [], []
+            if summary is not None:
+                summary.update(df)
+            if store is not None:
+                store.append(df)
+            else:
+                df.to_csv(output_path, mode='a', header=False, index=False)
+
+    if cube is not None:
+        cube.values.flush()
+        if checkpoint_dir is not None:
+            if summary is not None:
+                for c in range(0, len(concentrations), conc_block):
+                    summary.update(cube.frame(points=(c, min(c + conc_block, len(concentrations)))))
+            remove_checkpoint(checkpoint_dir, n_tasks)
+    elif checkpoint_dir is None:
+        if store is not None:
+            store.close()
+    else:
+        sweep_frames = iter_sweep_frames(checkpoint_dir, len(concentrations), n_gamma, conc_block, gamma_block,
+                                         list(empty.columns))
+        if metadata is not None:
+            with GVRStoreWriter(output_path, metadata) as store:
+                for df in sweep_frames:
+                    store.append(df)
+                    if summary is not None:
+                        summary.update(df)
+        else:
+            with open(output_path, 'w') as f:
+                f.write(header)
+            for df in sweep_frames:
+                df.to_csv(output_path, mode='a', header=False, index=False)
+                if summary is not None:
+                    summary.update(df)
+        remove_checkpoint(checkpoint_dir, n_tasks)
+    if summary is not None:
+        summary.save(marginal_summary_path(output_path))
+    print(f"Done. Results saved to {output_path}")
+
 #main execution
 if __name__ == '__main__':
-    concentrations = np.round(np.arange(0.0, 1.01, 0.1), 2)
+    concentrations = simplex_lattice(4, 0.1)
     gamma_vals = np.round(np.arange(0.2, 2.01, 0.2), 2)
-    compositions = generate_compositions()
-    composition_perms = generate_permutations(compositions)
-
-    tasks = []
-    for wt in concentrations:
-        for h in concentrations:
-            for nf in concentrations:
-                for cf in concentrations:
-                    if np.isclose(wt + h + nf + cf, 1.0):
-                        for g1 in gamma_vals:
-                            for g2 in gamma_vals:
-                                for g3 in gamma_vals:
-                                    for g4 in gamma_vals:
-                                        tasks.append((wt, h, nf, cf, g1, g2, g3, g4, composition_perms))
-
-    print(f"Total tasks: {len(tasks)} — running on {cpu_count()} cores...")
-
-    with Pool(cpu_count()) as pool:
-        results = list(tqdm(pool.imap(compute_gvr, tasks), total=len(tasks)))
-
-    df = pd.DataFrame(results).round(3)
-    df.to_csv("papa_gvr_output.csv", index=False)
-    print("Done. Results saved to papa_gvr_output.csv")
\ No newline at end of file
+    run_sweep(concentrations, gamma_vals, ordered=False, output_path="papa_gvr_output.csv")
@@ -0,0 +1,91 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+"""checkpoint/resume for long sweeps: the sweep is split into
+deterministic shards, each finished shard is written to its own file
+in the checkpoint directory and recorded in manifest.json, a restart
+only computes the shards that are missing, and iter_shard_frames reads
+them back in shard order for the sweep to merge into its output"""
+
+MANIFEST_NAME = 'manifest.json'
+
+#fingerprint of everything that decides shard boundaries and contents
+def sweep_fingerprint(*arrays, **params):
+    digest = hashlib.sha256()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        digest.update(str((arr.dtype.str, arr.shape)).encode())
+        digest.update(arr.tobytes())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def shard_path(checkpoint_dir, shard_id):
+    return os.path.join(checkpoint_dir, f'shard_{shard_id:06d}.csv')
+
+#write json next to its final name then swap it in, so a crash never leaves half a file
+def _atomic_write_text(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _write_manifest(checkpoint_dir, manifest):
+    _atomic_write_text(os.path.join(checkpoint_dir, MANIFEST_NAME), json.dumps(manifest))
+
+#load (or start) the manifest and return the set of completed shard ids
+#(shard_files=False when results go straight into an output that persists itself, e.g. a cube)
+def load_manifest(checkpoint_dir, fingerprint, n_shards, shard_files=True):
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    path = os.path.join(checkpoint_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        manifest = {'fingerprint': fingerprint, 'n_shards': n_shards, 'completed': []}
+        _write_manifest(checkpoint_dir, manifest)
+        return set()
+
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest['fingerprint'] != fingerprint or manifest['n_shards'] != n_shards:
+        raise ValueError(f"checkpoint in {checkpoint_dir} was written by a different sweep")
+    if not shard_files:
+        return set(manifest['completed'])
+    #a shard only counts if its file survived as well
+    return {i for i in manifest['completed'] if os.path.exists(shard_path(checkpoint_dir, i))}
+
+#persist one finished shard (a DataFrame, written without header) and record it in the manifest
+def save_shard(checkpoint_dir, shard_id, df, completed):
+    path = shard_path(checkpoint_dir, shard_id)
+    df.to_csv(path + '.tmp', header=False, index=False)
+    os.replace(path + '.tmp', path)
+    mark_shard_complete(checkpoint_dir, shard_id, completed)
+
+#record a finished shard in the manifest
+def mark_shard_complete(checkpoint_dir, shard_id, completed):
+    completed.add(shard_id)
+    with open(os.path.join(checkpoint_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    manifest['completed'] = sorted(completed)
+    _write_manifest(checkpoint_dir, manifest)
+
+#forget every finished shard (e.g. when the output they were written into is gone)
+def clear_manifest(checkpoint_dir, completed):
+    completed.clear()
+    with open(os.path.join(checkpoint_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    manifest['completed'] = []
+    _write_manifest(checkpoint_dir, manifest)
+
+#shards in order as DataFrames, for merging into a non-CSV output
+def iter_shard_frames(checkpoint_dir, n_shards, columns):
+    for shard_id in range(n_shards):
+        yield pd.read_csv(shard_path(checkpoint_dir, shard_id), header=None, names=columns)
+
+def remove_checkpoint(checkpoint_dir, n_shards):
+    for shard_id in range(n_shards):
+        if os.path.exists(shard_path(checkpoint_dir, shard_id)):
+            os.remove(shard_path(checkpoint_dir, shard_id))
+    os.remove(os.path.join(checkpoint_dir, MANIFEST_NAME))
+    if not os.listdir(checkpoint_dir):
+        os.rmdir(checkpoint_dir)
@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+import zipfile
+import numpy as np
+
+"""content-addressed on-disk cache for precomputed model tables
+(composition arrays, multinomial coefficients, distance-bin/pair tables).
+the file name is a hash of everything that decides the table: model
+name and version, ring size, species, distance thresholds, ... so a
+changed parameter is simply a different entry. entries are .npz files
+with a checksum of their arrays, written atomically (safe with several
+workers filling the same entry), refreshed on every hit and evicted
+least-recently-used first once the cache grows past max_bytes"""
+
+TABLE_CACHE_DIR = os.environ.get(
+    'PAPA_TABLE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'papa_gvr_tables'))
+TABLE_CACHE_MAX_BYTES = 256 * 2 ** 20
+
+#hash of the parameters that decide a table
+def table_key(name, params):
+    text = json.dumps({'name': name, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def table_cache_path(name, params, cache_dir=None):
+    return os.path.join(cache_dir or TABLE_CACHE_DIR, f'{name}-{table_key(name, params)[:32]}.npz')
+
+#checksum over the dtype, shape and bytes of every array
+def _arrays_checksum(arrays):
+    digest = hashlib.sha256()
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        digest.update(str((arr.dtype.str, arr.shape)).encode())
+        digest.update(arr.tobytes())
+    return digest.hexdigest()
+
+#the tuple of arrays stored under path, or None if it is missing, unreadable or fails its checksum
+def _read_entry(path, name, params):
+    try:
+        with np.load(path) as entry:
+            meta = json.loads(str(entry['__meta__']))
+            arrays = tuple(entry[f'arr_{i}'] for i in range(meta['n_arrays']))
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+    if meta.get('key') != table_key(name, params) or meta.get('checksum') != _arrays_checksum(arrays):
+        return None
+    return arrays
+
+#save next to the final name and swap it in, so readers never see half a file
+def _write_entry(path, name, params, arrays):
+    meta = {'name': name, 'params': params, 'key': table_key(name, params),
+            'n_arrays': len(arrays), 'checksum': _arrays_checksum(arrays)}
+    tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(tmp_path, __meta__=np.array(json.dumps(meta, sort_keys=True, default=str)),
+             **{f'arr_{i}': arr for i, arr in enumerate(arrays)})
+    os.replace(tmp_path, path)
+
+#drop least recently used entries until the cache fits in max_bytes
+def evict_tables(cache_dir=None, max_bytes=TABLE_CACHE_MAX_BYTES, keep=()):
+    cache_dir = cache_dir or TABLE_CACHE_DIR
+    entries = []
+    for fname in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, fname)
+        if fname.endswith('.npz') and '.tmp' not in fname:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+#load the tables for (name, params) from the cache, building and storing them with builder() on a miss
+def cached_tables(name, params, builder, cache_dir=None, max_bytes=TABLE_CACHE_MAX_BYTES):
+    cache_dir = cache_dir or TABLE_CACHE_DIR
+    path = table_cache_path(name, params, cache_dir)
+    if os.path.exists(path):
+        arrays = _read_entry(path, name, params)
+        if arrays is not None:
+            try:
+                #mark as recently used
+                os.utime(path)
+            except OSError:
+                pass
+            return arrays
+    arrays = tuple(np.asarray(a) for a in builder())
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_entry(path, name, params, arrays)
+        evict_tables(cache_dir, max_bytes, keep=(path,))
+    except OSError:
+        #read-only or full disk: the tables are still good, just not cached
+        pass
+    return arrays
+
+#remove every cached table
+def clear_table_cache(cache_dir=None):
+    cache_dir = cache_dir or TABLE_CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return
+    for fname in os.listdir(cache_dir):
+        if fname.endswith('.npz'):
+            os.remove(os.path.join(cache_dir, fname))
@@ -1,6 +1,8 @@
 import numpy as np
-import pandas as pd
 from scipy.special import comb
+from Simplex_Lattice import simplex_lattice
+from GVR_Store import save_gvr_table, long_format
+from Marginal_Summary import write_marginal_summary
 
 #compute pentamer compositions
 compositions = []
@@ -18,6 +20,9 @@ nf_vec = compositions[:, 2]
 cf_vec = compositions[:, 3]
 multinomial_coeffs = comb(5, wt_vec) * comb(5 - wt_vec, h_vec) * comb(5 - wt_vec - h_vec, nf_vec)
 
+#PAPA weight of each composition (HALO x NFAST-CFAST pairs)
+papa_weights = h_vec * np.minimum(nf_vec, cf_vec)
+
 #Split-FAST GVR calculation with gamma
 def compute_split_fast_gvr(wt_conc, halo_conc, nfast_conc, cfast_conc, gamma=1.0, alpha=1.0, beta=1.0):
     total_conc = wt_conc + halo_conc + nfast_conc + cfast_conc
@@ -30,43 +35,85 @@ def compute_split_fast_gvr(wt_conc, halo_conc, nfast_conc, cfast_conc, gamma=1.0
     p_cf = cfast_conc / total_conc
 
     probs = multinomial_coeffs * (p_wt ** wt_vec) * (p_h ** h_vec) * (p_nf ** nf_vec) * (p_cf ** cf_vec)
-    paired_fast = np.minimum(nf_vec, cf_vec)
-    papa_weight = h_vec * paired_fast
 
-    green_signal = beta * np.sum(papa_weight * probs)
+    green_signal = beta * np.sum(papa_weights * probs)
     violet_signal = alpha * halo_conc
 
     gvr = gamma * (green_signal / violet_signal) if violet_signal > 0 else np.nan
     return gvr
 
-# Sweep over concentrations and gamma values
-step = 0.05
-concentration_range = np.arange(0.0, 1.01, step)
-gamma_values = [0.25, 0.5, 1.0, 2.0, 4.0]
-
-results = []
-
-for wt in concentration_range:
-    for h in concentration_range:
-        for nf in concentration_range:
-            for cf in concentration_range:
-                total = wt + h + nf + cf
-                if np.isclose(total, 1.0):
-                    for gamma in gamma_values:
-                        gvr = compute_split_fast_gvr(wt, h, nf, cf, gamma=gamma)
-                        results.append({
-                            '[NPM1]_WT': wt,
-                            '[NPM1]_Halo': h,
-                            '[NPM1]_NFAST': nf,
-                            '[NPM1]_CFAST': cf,
-                            'Gamma': gamma,
-                            'GVR': gvr
-                        })
-
-# Create and round DataFrame
-df = pd.DataFrame(results)
-df = df.round(3)
-
-# Show or export
-print(df.head())
-df.to_csv("split_fast_gvr_with_gamma.csv", index=False)
\ No newline at end of file
+"""fused evaluation: green and violet signals are computed once for a
+whole array of concentration points, and every requested metric is
+derived from them with gamma broadcast across the points, so GVR,
+Experiment, G, V or any custom f(G, V, gamma) come out of one pass"""
+
+SPLIT_FAST_COLUMNS = ['[NPM1]_WT', '[NPM1]_Halo', '[NPM1]_NFAST', '[NPM1]_CFAST']
+
+#green (G) and violet (V) signals for an (N x 4) array of WT/HALO/NFAST/CFAST concentrations,
+#chunk_size points at a time so the (points x compositions) probabilities stay small
+def compute_split_fast_signals(concentrations, alpha=1.0, beta=1.0, chunk_size=65536):
+    conc = np.atleast_2d(np.asarray(concentrations, dtype=float))
+    green_signal = np.empty(len(conc))
+    for start in range(0, len(conc), chunk_size):
+        block = conc[start:start + chunk_size]
+        total = block.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = np.where(total > 0, block / total, np.nan)
+        #same factor order as compute_split_fast_gvr, so results match it bit for bit
+        probs = (multinomial_coeffs * (p[:, 0:1] ** wt_vec) * (p[:, 1:2] ** h_vec)
+                 * (p[:, 2:3] ** nf_vec) * (p[:, 3:4] ** cf_vec))
+        green_signal[start:start + chunk_size] = beta * np.sum(papa_weights * probs, axis=1)
+    violet_signal = alpha * conc[:, 1]
+    return green_signal, violet_signal
+
+#G / V, NaN where there is no violet signal
+def _signal_ratio(G, V):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(V > 0, G / V, np.nan)
+
+#built-in metrics as f(G, V, gamma); G and V are (points x 1), gamma is (1 x gammas)
+SPLIT_FAST_METRICS = {
+    'GVR': lambda G, V, gamma: gamma * _signal_ratio(G, V),
+    'Experiment': lambda G, V, gamma: gamma * _signal_ratio(G, V) * (G - V),
+    'G': lambda G, V, gamma: G + 0 * gamma,
+    'V': lambda G, V, gamma: V + 0 * gamma,
+}
+
+#Split-FAST GVR for an (N x 4) concentration array and a vector of gammas: (N x gammas),
+#NaN where the total or [HALO] is 0
+def compute_split_fast_gvr_batch(concentrations, gamma_values=(1.0,), alpha=1.0, beta=1.0, chunk_size=65536):
+    G, V = compute_split_fast_signals(concentrations, alpha, beta, chunk_size)
+    gamma = np.atleast_1d(np.asarray(gamma_values, dtype=float))[None, :]
+    return SPLIT_FAST_METRICS['GVR'](G[:, None], V[:, None], gamma)
+
+#long-format table (point outer, gamma inner) with one column per metric;
+#metrics are names from SPLIT_FAST_METRICS or a dict of name -> f(G, V, gamma)
+def compute_split_fast_metrics(concentrations, gamma_values, metrics=('GVR',), alpha=1.0, beta=1.0,
+                               conc_columns=SPLIT_FAST_COLUMNS):
+    if not isinstance(metrics, dict):
+        metrics = {name: SPLIT_FAST_METRICS[name] for name in metrics}
+    conc = np.atleast_2d(np.asarray(concentrations, dtype=float))
+    gamma = np.asarray(gamma_values, dtype=float)[None, :]
+    G, V = compute_split_fast_signals(conc, alpha, beta)
+    G, V = G[:, None], V[:, None]
+
+    #custom expressions may divide by V too; those points just come out NaN/inf
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = {name: np.broadcast_to(func(G, V, gamma), (len(conc), gamma.shape[1])) for name, func in metrics.items()}
+    return long_format(conc, conc_columns, gamma[0], ['Gamma'], values)
+
+if __name__ == '__main__':
+    # Sweep over concentrations and gamma values
+    step = 0.05
+    gamma_values = [0.25, 0.5, 1.0, 2.0, 4.0]
+
+    #GVR and Experiment from one pass over the concentration points
+    df = compute_split_fast_metrics(simplex_lattice(4, step), gamma_values, metrics=('GVR', 'Experiment'))
+    df = df.round(3)
+
+    # Show or export
+    print(df.head())
+    save_gvr_table(df.drop(columns='Experiment'), "split_fast_gvr_with_gamma.csv", model='split_fast')
+    save_gvr_table(df.drop(columns='GVR'), "split_fast_experiment_with_gamma.csv", model='split_fast_experiment')
+    #per-column marginals of GVR for the WT/Halo/NFast/CFast/Gamma graphs
+    write_marginal_summary(df, "split_fast_gvr_with_gamma.csv", SPLIT_FAST_COLUMNS + ['Gamma'])
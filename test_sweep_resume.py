@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import Splitfast_Distance_GVR
+from Simplex_Lattice import simplex_lattice
+from GVR_Cube import open_gvr_cube
+
+class Interrupted(Exception):
+    pass
+
+#a resumed cube sweep whose cube was deleted recomputes every shard instead of leaving them NaN
+def test_cube_resume_after_cube_deleted(tmp_path, monkeypatch):
+    concentrations = simplex_lattice(4, 0.25)
+    gamma_vals = np.round(np.arange(0.2, 1.41, 0.2), 2)
+    kwargs = dict(conc_block=8, gamma_block=7, marginals=False)
+
+    reference_path = str(tmp_path / 'reference.npy')
+    Splitfast_Distance_GVR.run_sweep(concentrations, gamma_vals, True, reference_path, **kwargs)
+    reference = np.asarray(open_gvr_cube(reference_path).values)
+
+    #crash after a few shards are recorded
+    mark = Splitfast_Distance_GVR.mark_shard_complete
+    def crash_after_three(checkpoint_dir, shard_id, completed):
+        mark(checkpoint_dir, shard_id, completed)
+        if len(completed) == 3:
+            raise Interrupted
+    monkeypatch.setattr(Splitfast_Distance_GVR, 'mark_shard_complete', crash_after_three)
+    path = str(tmp_path / 'sweep.npy')
+    checkpoint_dir = str(tmp_path / 'checkpoint')
+    with pytest.raises(Interrupted):
+        Splitfast_Distance_GVR.run_sweep(concentrations, gamma_vals, True, path, checkpoint_dir=checkpoint_dir, **kwargs)
+    monkeypatch.setattr(Splitfast_Distance_GVR, 'mark_shard_complete', mark)
+
+    (tmp_path / 'sweep.npy').unlink()
+    Splitfast_Distance_GVR.run_sweep(concentrations, gamma_vals, True, path, checkpoint_dir=checkpoint_dir, **kwargs)
+    np.testing.assert_array_equal(np.asarray(open_gvr_cube(path).values), reference)